@@ -4,9 +4,49 @@ Supports OpenAI, Anthropic, and local models via Ollama.
 """
 
 import asyncio
+import functools
+import hashlib
+import importlib.util
+import json
 import os
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterator
 from enum import Enum
-from typing import Optional
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+# Placeholder embeddings: rotations of one shared Gaussian vector, sign-flipped
+# per text, instead of seeding an RNG on every call
+_DUMMY_EMBEDDING_DIM = 384
+_SIGNS = np.array([1.0, -1.0], dtype=np.float32)
+
+
+@functools.cache
+def _dummy_rotations() -> np.ndarray:
+    """All rotations of the placeholder base vector, built on first use."""
+    base = np.random.default_rng(0).standard_normal(_DUMMY_EMBEDDING_DIM, dtype=np.float32)
+    return np.stack([np.roll(base, k) for k in range(_DUMMY_EMBEDDING_DIM)])
+
+
+# A system prompt is either plain text or a (stable, volatile) pair; the stable
+# half is sent first so provider prompt caches can reuse it across turns
+SystemPrompt = Union[str, tuple[str, str]]
+
+
+def _system_text(system: Optional[SystemPrompt]) -> str:
+    """Flatten a system prompt to a single string."""
+    if isinstance(system, tuple):
+        return "\n\n".join(part for part in system if part)
+    return system or ""
+
+
+# HTTP/2 lets concurrent module calls share one TLS connection (needs the h2 package)
+H2_AVAILABLE = importlib.util.find_spec("h2") is not None
 
 
 class LLMProvider(Enum):
@@ -15,140 +55,785 @@ class LLMProvider(Enum):
     OLLAMA = "ollama"
 
 
+# Provider auto-detection, in priority order
+_PROVIDER_ENV_VARS = (
+    (LLMProvider.ANTHROPIC, "ANTHROPIC_API_KEY"),
+    (LLMProvider.OPENAI, "OPENAI_API_KEY"),
+    (LLMProvider.OLLAMA, "OLLAMA_MODEL"),
+)
+
+
 class LLMWrapper:
-    """Unified LLM interface supporting multiple providers."""
+    """
+    Unified LLM interface supporting multiple providers.
+
+    Each provider keeps one pooled httpx.AsyncClient (HTTP/2 for the hosted
+    APIs when h2 is installed) for the lifetime of the wrapper; owners should
+    call aclose() on shutdown to release it.
+    """
+
+    # Embedding limits
+    EMBEDDING_MODEL = "text-embedding-3-small"
+    MAX_EMBEDDING_BATCH = 96  # items per embeddings request
+    MAX_EMBEDDING_BATCH_TOKENS = 250_000  # estimated tokens per embeddings request
+    EMBEDDING_CACHE_SIZE = 4096  # cached texts (LRU eviction)
+    RESPONSE_CACHE_SIZE = 512  # cached completions (FIFO eviction)
+    DET_CACHE_SIZE = 10_000  # cached deterministic short completions (FIFO eviction)
+
+    # Transient-error handling
+    RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+    MAX_RETRY_DELAY = 30.0  # seconds
+
+    # Shared connection pool for the hosted-API clients
+    HTTP_MAX_KEEPALIVE = 64
+    HTTP_MAX_CONNECTIONS = 128
 
     def __init__(self):
         self.provider = self._detect_provider()
         self.client = None
+        self.embedding_client = None
+        self._init_state()
         self._initialize_client()
 
+    def _init_state(self):
+        """Initialize in-process caches and request bookkeeping."""
+        # Backpressure: cap concurrent provider calls; SDK clients retry transient errors.
+        # The semaphore is created on first use, inside the running loop (Python 3.9
+        # binds asyncio primitives to the loop current at construction)
+        self.max_inflight = int(os.getenv("LLM_MAX_INFLIGHT", "8"))
+        self._inflight_limit: Optional[asyncio.Semaphore] = None
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "4"))
+
+        self._emb_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._emb_hits = 0
+        self._emb_misses = 0
+        # Embedding lookups may run on worker threads (to_thread); guard the LRU
+        # and the shared sqlite connection
+        self._emb_cache_lock = threading.Lock()
+        self._emb_db_lock = threading.Lock()
+
+        # Persistent embedding cache (OpenAI only); empty path disables it
+        db_path = os.getenv("EMBEDDING_CACHE_DB", "state/embedding_cache.db")
+        self._emb_db_path = Path(db_path) if db_path else None
+        self._emb_db: Optional[sqlite3.Connection] = None
+
+        # Semantic response cache; disabled unless a similarity threshold is set
+        threshold = os.getenv("LLM_RESPONSE_CACHE_THRESHOLD")
+        self._resp_cache_threshold = float(threshold) if threshold else None
+        self._resp_cache_vecs: Optional[np.ndarray] = None  # L2-normalized rows
+        self._resp_cache_entries: list[str] = []
+        self._resp_cache_count = 0
+
+        # Exact-match cache for temperature-0 short completions (yes/no gates, probes)
+        self._det_cache_max_tokens = int(os.getenv("LLM_DET_CACHE_MAX_TOK", "16"))
+        self._det_cache: dict[bytes, str] = {}
+
+        # In-flight generate() calls, so concurrent identical requests share one result:
+        # key -> [upstream task, number of callers awaiting it]
+        self._inflight: dict[tuple, list] = {}
+
     def _detect_provider(self) -> LLMProvider:
         """Auto-detect which provider to use based on environment."""
-        if os.getenv("ANTHROPIC_API_KEY"):
-            return LLMProvider.ANTHROPIC
-        elif os.getenv("OPENAI_API_KEY"):
-            return LLMProvider.OPENAI
-        elif os.getenv("OLLAMA_MODEL"):
-            return LLMProvider.OLLAMA
-        else:
-            raise ValueError(
-                "No LLM provider configured. Set one of:\n"
-                "  - ANTHROPIC_API_KEY\n"
-                "  - OPENAI_API_KEY\n"
-                "  - OLLAMA_MODEL (for local models)"
-            )
+        for provider, env_var in _PROVIDER_ENV_VARS:
+            if os.getenv(env_var):
+                return provider
+        raise ValueError(
+            "No LLM provider configured. Set one of:\n"
+            "  - ANTHROPIC_API_KEY\n"
+            "  - OPENAI_API_KEY\n"
+            "  - OLLAMA_MODEL (for local models)"
+        )
 
     def _initialize_client(self):
-        """Initialize the appropriate client."""
-        if self.provider == LLMProvider.ANTHROPIC:
-            import anthropic
+        """Initialize the appropriate client and bind its generate method."""
+        init_client, self._generate_impl = {
+            LLMProvider.ANTHROPIC: (self._init_anthropic, self._generate_anthropic),
+            LLMProvider.OPENAI: (self._init_openai, self._generate_openai),
+            LLMProvider.OLLAMA: (self._init_ollama, self._generate_ollama),
+        }[self.provider]
+        init_client()
+
+        # Request fields that never change per call, merged into each request body
+        self._request_base = {"model": self.model}
 
-            self.client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-            self.model = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-20250514")
+        # Provider is fixed after init: with the response cache off, bind the provider
+        # coroutine directly so generate() skips the cache frame on every call
+        if self._resp_cache_threshold is None:
+            self._generate_cached = self._generate_impl
 
-        elif self.provider == LLMProvider.OPENAI:
-            import openai
+    def _init_anthropic(self):
+        """Initialize Anthropic client."""
+        import anthropic
 
-            self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-            self.model = os.getenv("OPENAI_MODEL", "gpt-4")
+        self.client = anthropic.AsyncAnthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            max_retries=self.max_retries,
+            http_client=anthropic.DefaultAsyncHttpxClient(**self._http_client_options()),
+        )
+        self.model = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-20250514")
 
-        elif self.provider == LLMProvider.OLLAMA:
-            import httpx
+    def _init_openai(self):
+        """Initialize OpenAI clients (async for chat, sync for embeddings)."""
+        import openai
 
-            self.client = httpx.AsyncClient()
-            self.model = os.getenv("OLLAMA_MODEL", "llama3.2")
-            self.ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        api_key = os.getenv("OPENAI_API_KEY")
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            max_retries=self.max_retries,
+            http_client=openai.DefaultAsyncHttpxClient(**self._http_client_options()),
+        )
+        # The memory system embeds synchronously, so embeddings keep a blocking client
+        self.embedding_client = openai.OpenAI(api_key=api_key, max_retries=self.max_retries)
+        self.model = os.getenv("OPENAI_MODEL", "gpt-4")
+
+    def _http_client_options(self) -> dict:
+        """Pool settings for the hosted-API clients, enabling HTTP/2 when available."""
+        import httpx
+
+        return {
+            "http2": H2_AVAILABLE,
+            "limits": httpx.Limits(
+                max_keepalive_connections=self.HTTP_MAX_KEEPALIVE,
+                max_connections=self.HTTP_MAX_CONNECTIONS,
+            ),
+            "timeout": httpx.Timeout(60.0, connect=5.0),
+        }
+
+    def _init_ollama(self):
+        """Initialize pooled HTTP client for local Ollama."""
+        import httpx
+
+        self.model = os.getenv("OLLAMA_MODEL", "llama3.2")
+        self.ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        # Keep-alive pool reused across calls; generation can take far longer
+        # than httpx's 5s default timeout
+        self.client = httpx.AsyncClient(
+            base_url=self.ollama_base_url,
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        )
+
+        # Micro-batching: requests arriving within the window are dispatched together,
+        # with at most max_batch in flight (0 ms disables the window)
+        self.batch_window_ms = float(os.getenv("OLLAMA_BATCH_WINDOW_MS", "10"))
+        self.max_batch = int(os.getenv("OLLAMA_MAX_BATCH", "8"))
+        self._ollama_queue: Optional[asyncio.Queue] = None
+        self._ollama_batcher: Optional[asyncio.Task] = None
+        self._ollama_sem: Optional[asyncio.Semaphore] = None
+        self._ollama_tasks: set[asyncio.Task] = set()
 
     async def generate(
         self,
         prompt: str,
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        system: Optional[str] = None,
+        system: Optional[SystemPrompt] = None,
+        json_mode: bool = False,
+    ) -> str:
+        """
+        Generate completion from prompt.
+        json_mode constrains the provider to emit a single JSON object.
+        """
+        det_key = None
+        if temperature == 0 and max_tokens <= self._det_cache_max_tokens:
+            det_key = self._det_cache_key(prompt, max_tokens, _system_text(system), json_mode)
+            cached = self._det_cache.get(det_key)
+            if cached is not None:
+                return cached
+
+        key = (
+            self.provider,
+            self.model,
+            round(temperature, 3),
+            max_tokens,
+            system or "",
+            json_mode,
+            prompt,
+        )
+        entry = self._inflight.get(key)
+        if entry is None:
+            # The upstream call runs as its own task so it survives any one caller
+            # being cancelled; it is only cancelled when every caller has left
+            task = asyncio.create_task(
+                self._generate_shared(
+                    key, det_key, prompt, temperature, max_tokens, system, json_mode
+                )
+            )
+            entry = self._inflight[key] = [task, 0]
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if entry[1] == 1:
+                task.cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    async def _generate_shared(
+        self,
+        key: tuple,
+        det_key: Optional[bytes],
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        system: Optional[SystemPrompt],
+        json_mode: bool,
+    ) -> str:
+        """Run one upstream generation on behalf of every coalesced caller."""
+        try:
+            async with self._inflight_gate():
+                result = await self._generate_cached(
+                    prompt, temperature, max_tokens, system, json_mode
+                )
+        finally:
+            del self._inflight[key]
+        if det_key is not None:
+            self._remember_deterministic(det_key, result)
+        return result
+
+    def _inflight_gate(self) -> asyncio.Semaphore:
+        """Semaphore capping concurrent upstream requests (created inside the running loop)."""
+        if self._inflight_limit is None:
+            self._inflight_limit = asyncio.Semaphore(self.max_inflight)
+        return self._inflight_limit
+
+    @staticmethod
+    def _det_cache_key(prompt: str, max_tokens: int, system: str, json_mode: bool = False) -> bytes:
+        """Hash a deterministic request into a compact exact-match cache key."""
+        data = f"{max_tokens}\0{int(json_mode)}\0{system}\0{prompt}".encode()
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def _remember_deterministic(self, key: bytes, completion: str):
+        """Insert a deterministic completion, evicting the oldest entry when full."""
+        self._det_cache[key] = completion
+        if len(self._det_cache) > self.DET_CACHE_SIZE:
+            del self._det_cache[next(iter(self._det_cache))]
+
+    async def _generate_cached(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        system: Optional[SystemPrompt],
+        json_mode: bool = False,
     ) -> str:
-        """Generate completion from prompt."""
-        if self.provider == LLMProvider.ANTHROPIC:
-            return await self._generate_anthropic(prompt, temperature, max_tokens, system)
-        elif self.provider == LLMProvider.OPENAI:
-            return await self._generate_openai(prompt, temperature, max_tokens, system)
-        elif self.provider == LLMProvider.OLLAMA:
-            return await self._generate_ollama(prompt, temperature, max_tokens, system)
+        """Generate via the response cache (when enabled) or the provider."""
+        if self._resp_cache_threshold is None or json_mode:
+            # JSON requests bypass the semantic cache: a similar free-text
+            # completion is not a valid substitute
+            return await self._generate_impl(prompt, temperature, max_tokens, system, json_mode)
+
+        system_text = _system_text(system)
+        query = await self.aget_embedding_np(f"{system_text}\n{prompt}" if system_text else prompt)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        cached = self._lookup_response(query)
+        if cached is not None:
+            return cached
+
+        completion = await self._generate_impl(prompt, temperature, max_tokens, system)
+        self._store_response(query, completion)
+        return completion
+
+    def _lookup_response(self, query: np.ndarray) -> Optional[str]:
+        """Return the cached completion most similar to query, if above threshold."""
+        n = min(self._resp_cache_count, self.RESPONSE_CACHE_SIZE)
+        if n == 0:
+            return None
+        # Rows are stored as float16; upcast for the matmul (numpy has no fp16 BLAS)
+        sims = self._resp_cache_vecs[:n].astype(np.float32) @ query
+        best = int(np.argmax(sims))
+        if sims[best] < self._resp_cache_threshold:
+            return None
+        return self._resp_cache_entries[best]
+
+    def _store_response(self, query: np.ndarray, completion: str):
+        """Insert a completion into the ring buffer, overwriting the oldest entry."""
+        if self._resp_cache_vecs is None:
+            # float16 halves the footprint; ample precision for ~0.9 similarity thresholds
+            self._resp_cache_vecs = np.zeros(
+                (self.RESPONSE_CACHE_SIZE, query.shape[0]), dtype=np.float16
+            )
+        slot = self._resp_cache_count % self.RESPONSE_CACHE_SIZE
+        self._resp_cache_vecs[slot] = query
+        if slot < len(self._resp_cache_entries):
+            self._resp_cache_entries[slot] = completion
+        else:
+            self._resp_cache_entries.append(completion)
+        self._resp_cache_count += 1
 
     async def _generate_anthropic(
-        self, prompt: str, temperature: float, max_tokens: int, system: Optional[str]
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        system: Optional[SystemPrompt],
+        json_mode: bool = False,
     ) -> str:
         """Generate using Anthropic API."""
-        messages = [{"role": "user", "content": prompt}]
-
         kwargs = {
-            "model": self.model,
+            **self._request_base,
             "max_tokens": max_tokens,
             "temperature": temperature,
-            "messages": messages,
+            "messages": [{"role": "user", "content": prompt}],
         }
 
-        if system:
+        if isinstance(system, tuple):
+            # Mark the stable half as a cache breakpoint so later turns reuse it
+            stable, volatile = system
+            kwargs["system"] = [
+                {"type": "text", "text": stable, "cache_control": {"type": "ephemeral"}}
+            ]
+            if volatile:
+                kwargs["system"].append({"type": "text", "text": volatile})
+        elif system:
             kwargs["system"] = system
 
-        # Run blocking API call in thread pool to avoid blocking the event loop
-        response = await asyncio.to_thread(self.client.messages.create, **kwargs)
+        if json_mode:
+            # No native JSON mode: prefill the opening brace so the reply starts as an object
+            kwargs["messages"].append({"role": "assistant", "content": "{"})
+            response = await self.client.messages.create(**kwargs)
+            return "{" + response.content[0].text
+
+        response = await self.client.messages.create(**kwargs)
         return response.content[0].text
 
     async def _generate_openai(
-        self, prompt: str, temperature: float, max_tokens: int, system: Optional[str]
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        system: Optional[SystemPrompt],
+        json_mode: bool = False,
     ) -> str:
         """Generate using OpenAI API."""
-        messages = []
-
+        # Build the message list in one literal instead of appending
         if system:
-            messages.append({"role": "system", "content": system})
-
-        messages.append({"role": "user", "content": prompt})
+            # OpenAI caches shared prompt prefixes automatically; keep the stable half first
+            messages = [
+                {"role": "system", "content": _system_text(system)},
+                {"role": "user", "content": prompt},
+            ]
+        else:
+            messages = [{"role": "user", "content": prompt}]
 
-        # Run blocking API call in thread pool to avoid blocking the event loop
-        response = await asyncio.to_thread(
-            self.client.chat.completions.create,
-            model=self.model,
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+        response = await self.client.chat.completions.create(
+            **self._request_base,
             messages=messages,
             temperature=temperature,
             max_tokens=max_tokens,
+            **extra,
         )
 
         return response.choices[0].message.content
 
     async def _generate_ollama(
-        self, prompt: str, temperature: float, max_tokens: int, system: Optional[str]
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        system: Optional[SystemPrompt],
+        json_mode: bool = False,
     ) -> str:
         """Generate using local Ollama."""
+        payload = self._ollama_payload(prompt, temperature, max_tokens, system)
+        payload["stream"] = False  # Ollama streams NDJSON by default
+        if json_mode:
+            payload["format"] = "json"
+
+        if self.batch_window_ms <= 0:
+            return await self._post_ollama(payload)
+
+        if self._ollama_batcher is None:
+            self._ollama_queue = asyncio.Queue()
+            self._ollama_sem = asyncio.Semaphore(self.max_batch)
+            self._ollama_batcher = asyncio.create_task(self._ollama_batch_loop())
+
+        future = asyncio.get_running_loop().create_future()
+        self._ollama_queue.put_nowait((payload, future))
+        return await future
+
+    async def _post_ollama(self, payload: dict) -> str:
+        """Send one non-streaming request to Ollama, retrying transient failures."""
+        for attempt in range(self.max_retries + 1):
+            response = await self.client.post("/api/generate", json=payload)
+            if response.status_code not in self.RETRY_STATUS_CODES or attempt == self.max_retries:
+                break
+            await asyncio.sleep(self._retry_delay(attempt, response.headers.get("Retry-After")))
+
+        response.raise_for_status()
+        data = response.json()
+        return data.get("response", "")
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Backoff delay: honor Retry-After, else exponential with full jitter."""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.MAX_RETRY_DELAY)
+            except ValueError:
+                pass  # HTTP-date form; fall back to backoff
+        return random.uniform(0, min(self.MAX_RETRY_DELAY, 2.0**attempt))
+
+    async def _ollama_batch_loop(self):
+        """Collect requests for one window, then dispatch them concurrently."""
+        while True:
+            batch = [await self._ollama_queue.get()]
+            await asyncio.sleep(self.batch_window_ms / 1000)
+            while len(batch) < self.max_batch and not self._ollama_queue.empty():
+                batch.append(self._ollama_queue.get_nowait())
+
+            for payload, future in batch:
+                task = asyncio.create_task(self._fulfil_ollama(payload, future))
+                self._ollama_tasks.add(task)
+                task.add_done_callback(self._ollama_tasks.discard)
+
+    async def _fulfil_ollama(self, payload: dict, future: asyncio.Future):
+        """Run a queued request and resolve its caller's future."""
+        async with self._ollama_sem:
+            if future.cancelled():
+                return
+            try:
+                result = await self._post_ollama(payload)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    async def _stream_ollama(
+        self, prompt: str, temperature: float, max_tokens: int, system: Optional[SystemPrompt]
+    ) -> AsyncIterator[str]:
+        """Stream tokens from local Ollama as they are generated, retrying transient failures."""
+        payload = self._ollama_payload(prompt, temperature, max_tokens, system)
+        payload["stream"] = True
+
+        async with self._inflight_gate():
+            for attempt in range(self.max_retries + 1):
+                async with self.client.stream("POST", "/api/generate", json=payload) as response:
+                    if (
+                        response.status_code not in self.RETRY_STATUS_CODES
+                        or attempt == self.max_retries
+                    ):
+                        # Error bodies are not NDJSON; fail before parsing any line
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            data = json.loads(line)
+                            chunk = data.get("response", "")
+                            if chunk:
+                                yield chunk
+                            if data.get("done"):
+                                break
+                        return
+                    delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                await asyncio.sleep(delay)
+
+    def _ollama_payload(
+        self, prompt: str, temperature: float, max_tokens: int, system: Optional[SystemPrompt]
+    ) -> dict:
+        """Build an Ollama /api/generate request body."""
         payload = {
-            "model": self.model,
+            **self._request_base,
             "prompt": prompt,
-            "temperature": temperature,
-            "options": {"num_predict": max_tokens},
+            "options": {"temperature": temperature, "num_predict": max_tokens},
         }
 
         if system:
-            payload["system"] = system
+            payload["system"] = _system_text(system)
 
-        response = await self.client.post(f"{self.ollama_base_url}/api/generate", json=payload)
+        return payload
 
-        data = response.json()
-        return data.get("response", "")
+    async def generate_stream(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        system: Optional[SystemPrompt] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream completion chunks from prompt.
+        Ollama streams token by token; other providers yield the full completion once.
+        """
+        if self.provider == LLMProvider.OLLAMA:
+            async for chunk in self._stream_ollama(prompt, temperature, max_tokens, system):
+                yield chunk
+        else:
+            yield await self.generate(prompt, temperature, max_tokens, system)
+
+    async def aclose(self):
+        """Release pooled connections and cache handles."""
+        if self.provider == LLMProvider.OLLAMA and self.client is not None:
+            if self._ollama_batcher is not None:
+                self._ollama_batcher.cancel()
+                self._ollama_batcher = None
+            await self.client.aclose()
+        elif self.client is not None:
+            await self.client.close()
+        if self.embedding_client is not None:
+            self.embedding_client.close()
+        with self._emb_db_lock:
+            if self._emb_db is not None:
+                self._emb_db.close()
+                self._emb_db = None
 
     def get_embedding(self, text: str) -> list[float]:
         """Generate embedding for text (used by memory system)."""
-        # Simple implementation - in production, use proper embedding model
+        return self.get_embedding_np(text).tolist()
+
+    def get_embedding_np(self, text: str) -> np.ndarray:
+        """Generate embedding for text as a read-only float32 array."""
+        cached = self._cached_embedding(text)
+        if cached is not None:
+            return cached
+        return self._remember_embedding(text, self._fetch_embedding(text))
+
+    async def aget_embedding(self, text: str) -> list[float]:
+        """Generate embedding asynchronously (safe for async contexts)."""
+        return (await self.aget_embedding_np(text)).tolist()
+
+    async def aget_embedding_np(self, text: str) -> np.ndarray:
+        """Generate embedding asynchronously as a read-only float32 array."""
+        cached = self._cached_embedding(text)
+        if cached is not None:
+            return cached
+
         if self.provider == LLMProvider.OPENAI:
-            response = self.client.embeddings.create(model="text-embedding-3-small", input=text)
-            return response.data[0].embedding
+            # Run blocking API/disk lookup in thread pool to avoid blocking the event loop
+            embedding = await asyncio.to_thread(self._fetch_embedding, text)
         else:
-            # Fallback: use sentence-transformers or similar
-            # For now, return dummy embedding using local RNG to avoid global state mutation
-            import hashlib
+            # Placeholder embedding is pure CPU and fast; not worth a thread hop
+            embedding = self._fetch_embedding(text)
+        return self._remember_embedding(text, embedding)
+
+    def _cached_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Look up an embedding in the in-memory LRU cache."""
+        with self._emb_cache_lock:
+            cached = self._emb_cache.get(text)
+            if cached is None:
+                self._emb_misses += 1
+                return None
+            self._emb_hits += 1
+            self._emb_cache.move_to_end(text)
+            return cached
+
+    def _remember_embedding(self, text: str, embedding: np.ndarray) -> np.ndarray:
+        """Insert an embedding into the in-memory LRU cache."""
+        # Cached arrays are shared between callers, so freeze them
+        embedding.flags.writeable = False
+        with self._emb_cache_lock:
+            self._emb_cache[text] = embedding
+            if len(self._emb_cache) > self.EMBEDDING_CACHE_SIZE:
+                self._emb_cache.popitem(last=False)
+        return embedding
+
+    def _fetch_embedding(self, text: str) -> np.ndarray:
+        """Embed text via the persistent cache or the provider (blocking)."""
+        embedding = self._load_persistent_embedding(text)
+        if embedding is None:
+            if self.provider != LLMProvider.OPENAI:
+                return self._dummy_embedding(text)
+            embedding = self._embed_openai_texts([text])[0]
+            self._store_persistent_embeddings([text], [embedding])
+        return embedding
+
+    def _get_embedding_db(self) -> Optional[sqlite3.Connection]:
+        """Open the persistent embedding cache on first use (call with _emb_db_lock held)."""
+        if self._emb_db is None and self._emb_db_path and self.provider == LLMProvider.OPENAI:
+            self._emb_db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._emb_db = sqlite3.connect(self._emb_db_path, check_same_thread=False)
+            self._emb_db.execute("PRAGMA journal_mode=WAL")
+            self._emb_db.execute("PRAGMA synchronous=NORMAL")
+            # Vectors are stored as float16 bytes (half the disk footprint)
+            self._emb_db.execute(
+                "CREATE TABLE IF NOT EXISTS emb_f16 (key BLOB PRIMARY KEY, vec BLOB)"
+            )
+            self._emb_db.commit()
+        return self._emb_db
+
+    def _embedding_key(self, text: str) -> bytes:
+        """Content-addressed cache key for (model, text)."""
+        return hashlib.sha256(f"{self.EMBEDDING_MODEL}\0{text}".encode()).digest()
+
+    def _load_persistent_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Look up an embedding in the persistent cache."""
+        key = self._embedding_key(text)
+        with self._emb_db_lock:
+            db = self._get_embedding_db()
+            if db is None:
+                return None
+            row = db.execute("SELECT vec FROM emb_f16 WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float16).astype(np.float32)
+
+    def _store_persistent_embeddings(self, texts: list[str], embeddings: list[np.ndarray]):
+        """Write embeddings to the persistent cache in one transaction."""
+        rows = [
+            (self._embedding_key(text), embedding.astype(np.float16).tobytes())
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._emb_db_lock:
+            db = self._get_embedding_db()
+            if db is None:
+                return
+            db.executemany("INSERT OR REPLACE INTO emb_f16 (key, vec) VALUES (?, ?)", rows)
+            db.commit()
+
+    def get_embedding_cache_stats(self) -> dict:
+        """Get embedding cache statistics."""
+        lookups = self._emb_hits + self._emb_misses
+        return {
+            "size": len(self._emb_cache),
+            "hits": self._emb_hits,
+            "misses": self._emb_misses,
+            "hit_rate": self._emb_hits / lookups if lookups else 0.0,
+        }
+
+    def get_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Generate embeddings for multiple texts.
+        Duplicates and cached texts are filtered out; the remaining OpenAI
+        requests are packed by length into batches of up to
+        MAX_EMBEDDING_BATCH inputs and MAX_EMBEDDING_BATCH_TOKENS tokens.
+        """
+        return self.get_embeddings_np(texts).tolist()
+
+    def get_embeddings_np(self, texts: list[str]) -> np.ndarray:
+        """Generate embeddings for multiple texts as an (n, dim) float32 array."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        if self.provider != LLMProvider.OPENAI:
+            return np.stack([self._dummy_embedding(text) for text in texts])
+
+        unique, order, vecs, missing = self._collect_cached_embeddings(texts)
+        if missing:
+            fetched = self._embed_openai_texts([unique[i] for i in missing])
+            self._fill_missing_embeddings(unique, vecs, missing, fetched)
+        return np.stack(vecs)[order]
+
+    async def aget_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """Generate embeddings asynchronously (sub-batches run concurrently)."""
+        if not texts:
+            return []
+
+        if self.provider != LLMProvider.OPENAI:
+            return self.get_embeddings(texts)
+
+        unique, order, vecs, missing = await asyncio.to_thread(
+            self._collect_cached_embeddings, texts
+        )
+        if missing:
+            misses = [unique[i] for i in missing]
+            batches = self._pack_batches(misses)
+            results = await asyncio.gather(
+                *(
+                    asyncio.to_thread(self._embed_openai_batch, [misses[i] for i in batch])
+                    for batch in batches
+                )
+            )
+            fetched = self._reassemble(batches, results)
+            await asyncio.to_thread(self._fill_missing_embeddings, unique, vecs, missing, fetched)
+        return np.stack(vecs)[order].tolist()
+
+    def _collect_cached_embeddings(
+        self, texts: list[str]
+    ) -> tuple[list[str], list[int], list[Optional[np.ndarray]], list[int]]:
+        """
+        Deduplicate texts and resolve what the caches already hold.
+        Returns (unique texts, index of each input into them, per-unique
+        vectors with None for misses, indices of the misses).
+        """
+        uniq: dict[str, int] = {}
+        order = [uniq.setdefault(text, len(uniq)) for text in texts]
+        unique = list(uniq)
+
+        vecs: list[Optional[np.ndarray]] = []
+        missing: list[int] = []
+        for i, text in enumerate(unique):
+            embedding = self._cached_embedding(text)
+            if embedding is None:
+                embedding = self._load_persistent_embedding(text)
+                if embedding is not None:
+                    embedding = self._remember_embedding(text, embedding)
+            if embedding is None:
+                missing.append(i)
+            vecs.append(embedding)
+        return unique, order, vecs, missing
+
+    def _fill_missing_embeddings(
+        self,
+        unique: list[str],
+        vecs: list[Optional[np.ndarray]],
+        missing: list[int],
+        fetched: np.ndarray,
+    ):
+        """Store freshly fetched embeddings in both caches and in vecs."""
+        misses = [unique[i] for i in missing]
+        self._store_persistent_embeddings(misses, list(fetched))
+        for i, text, embedding in zip(missing, misses, fetched):
+            vecs[i] = self._remember_embedding(text, embedding)
+
+    def _embed_openai_texts(self, texts: list[str]) -> np.ndarray:
+        """Embed texts with as few OpenAI calls as the batch limits allow."""
+        batches = self._pack_batches(texts)
+        results = [self._embed_openai_batch([texts[i] for i in batch]) for batch in batches]
+        return self._reassemble(batches, results)
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Conservative token estimate (~3 UTF-8 bytes per token)."""
+        return len(text.encode("utf-8")) // 3 + 1
+
+    def _pack_batches(self, texts: list[str]) -> list[list[int]]:
+        """
+        Pack text indices into request-sized batches.
+        Texts are sorted by estimated token count and packed greedily so short
+        inputs share requests while long ones stay under the token budget.
+        """
+        counts = [self._estimate_tokens(text) for text in texts]
+        batches: list[list[int]] = []
+        current: list[int] = []
+        budget = 0
+        for i in sorted(range(len(texts)), key=counts.__getitem__):
+            if current and (
+                len(current) >= self.MAX_EMBEDDING_BATCH
+                or budget + counts[i] > self.MAX_EMBEDDING_BATCH_TOKENS
+            ):
+                batches.append(current)
+                current, budget = [], 0
+            current.append(i)
+            budget += counts[i]
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _reassemble(batches: list[list[int]], results: list[np.ndarray]) -> np.ndarray:
+        """Scatter per-batch embeddings back into original input order."""
+        out = np.empty((sum(map(len, batches)), results[0].shape[1]), dtype=np.float32)
+        for batch, embeddings in zip(batches, results):
+            out[batch] = embeddings
+        return out
 
-            import numpy as np
+    def _embed_openai_batch(self, texts: list[str]) -> np.ndarray:
+        """Embed a single batch with one OpenAI API call."""
+        response = self.embedding_client.embeddings.create(model=self.EMBEDDING_MODEL, input=texts)
+        return np.array([d.embedding for d in response.data], dtype=np.float32)
 
-            hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
-            rng = np.random.default_rng(hash_val % (2**32))
-            return rng.standard_normal(384).tolist()
+    @staticmethod
+    def _dummy_embedding(text: str) -> np.ndarray:
+        """Deterministic placeholder embedding (not semantic)."""
+        # Fallback: use sentence-transformers or similar in production.
+        # 48-byte digest = 384 sign bits; the first two bytes pick the rotation.
+        digest = hashlib.blake2b(text.encode(), digest_size=_DUMMY_EMBEDDING_DIM // 8).digest()
+        embedding = _SIGNS[np.unpackbits(np.frombuffer(digest, dtype=np.uint8))]
+        embedding *= _dummy_rotations()[int.from_bytes(digest[:2], "little") % _DUMMY_EMBEDDING_DIM]
+        return embedding
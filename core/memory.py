@@ -3,11 +3,19 @@ Memory System - Hybrid vector + relational storage.
 Manages episodic memory, semantic embeddings, and persistent state.
 """
 
+import array
+import asyncio
+import functools
 import hashlib
+import importlib.util
 import json
 import os
+import queue
 import sqlite3
+import threading
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Any, Optional
 
@@ -22,21 +30,51 @@ except ImportError:
     FAISS_AVAILABLE = False
     print("⚠️  FAISS not available, using fallback vector search")
 
-# Optional: sentence-transformers for local embeddings
-try:
-    from sentence_transformers import SentenceTransformer
+# Optional: sentence-transformers for local embeddings and OpenAI for cloud
+# embeddings. Only probed here and imported when the provider is chosen: torch
+# and the OpenAI SDK otherwise dominate the import time of this module.
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
 
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
 
-# Optional: OpenAI for cloud embeddings
-try:
-    import openai
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (O(n) partition + O(k log k) sort)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best])]
+
+
+# Compact JSON for stored rows: no separator whitespace, non-ASCII kept as UTF-8
+_dumps = functools.partial(json.dumps, separators=(",", ":"), ensure_ascii=False)
+_EMPTY_JSON = "{}"
+
+# Bump whenever _hash_embeddings changes its output: the version is part of the
+# hash provider's model_id, so indexes built from older vectors are rebuilt
+_HASH_EMBEDDING_VERSION = 2
 
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+
+def _hash_embeddings(texts: list[str], dimension: int) -> np.ndarray:
+    """
+    Deterministic hash-derived embeddings (not semantic, but consistent).
+    SHAKE-128 output is read as uint32 uniforms and mapped to N(0, 1) with
+    one vectorized Box-Muller pass over the whole (n, dimension) matrix, so
+    no RNG object is built and the only per-text Python work is the digest.
+    """
+    half = (dimension + 1) // 2
+    digest = b"".join(hashlib.shake_128(text.encode()).digest(8 * half) for text in texts)
+    u = np.frombuffer(digest, dtype=np.uint32).reshape(len(texts), 2, half)
+    u = (u.astype(np.float32) + np.float32(0.5)) * np.float32(2.0**-32)  # in (0, 1)
+    radius = np.sqrt(np.float32(-2.0) * np.log(u[:, 0]))
+    theta = np.float32(2.0 * np.pi) * u[:, 1]
+    rows = np.concatenate((radius * np.cos(theta), radius * np.sin(theta)), axis=1)
+    return np.ascontiguousarray(rows[:, :dimension])
+
+
+def _hash_embedding(text: str, dimension: int) -> np.ndarray:
+    """Single-text form of _hash_embeddings."""
+    return _hash_embeddings([text], dimension)[0]
 
 
 class EmbeddingProvider:
@@ -45,10 +83,14 @@ class EmbeddingProvider:
     Priority: sentence-transformers > OpenAI > hash-based placeholder
     """
 
+    ENCODE_BATCH_SIZE = 64  # sentence-transformers batch size
+
     def __init__(self, dimension: int = 384):
         self.dimension = dimension
         self.provider_name = "none"
+        self.model_id = "none"  # provider + model, keys the persistent embedding cache
         self.model = None
+        self._device: Optional[str] = None
         self._init_provider()
 
     def _init_provider(self):
@@ -56,11 +98,15 @@ class EmbeddingProvider:
         # Try sentence-transformers first (local, free, good quality)
         if SENTENCE_TRANSFORMERS_AVAILABLE:
             try:
+                from sentence_transformers import SentenceTransformer
+
+                self._device = self._select_torch_device()
                 # all-MiniLM-L6-v2 is fast and produces 384-dim embeddings
-                self.model = SentenceTransformer("all-MiniLM-L6-v2")
+                self.model = SentenceTransformer("all-MiniLM-L6-v2", device=self._device)
                 self.dimension = 384
                 self.provider_name = "sentence-transformers"
-                print("✓ Using sentence-transformers for embeddings")
+                self.model_id = "sentence-transformers/all-MiniLM-L6-v2"
+                print(f"✓ Using sentence-transformers for embeddings ({self._device})")
                 return
             except Exception as e:
                 print(f"⚠️  sentence-transformers init failed: {e}")
@@ -68,9 +114,12 @@ class EmbeddingProvider:
         # Try OpenAI embeddings (cloud, requires API key)
         if OPENAI_AVAILABLE and os.environ.get("OPENAI_API_KEY"):
             try:
+                import openai
+
                 self.model = openai.OpenAI()
                 self.dimension = 1536  # text-embedding-3-small dimension
                 self.provider_name = "openai"
+                self.model_id = "openai/text-embedding-3-small"
                 print("✓ Using OpenAI for embeddings")
                 return
             except Exception as e:
@@ -78,11 +127,27 @@ class EmbeddingProvider:
 
         # Fallback to hash-based (deterministic but not semantic)
         self.provider_name = "hash-fallback"
+        self.model_id = f"hash-fallback-v{_HASH_EMBEDDING_VERSION}"
         self.dimension = 384
         print(
             "⚠️  Using hash-based fallback embeddings (install sentence-transformers for better quality)"
         )
 
+    @staticmethod
+    def _select_torch_device() -> str:
+        """Pick CUDA when available; otherwise size torch's CPU thread pools."""
+        import torch
+
+        if torch.cuda.is_available():
+            return "cuda"
+        # Use every core for intra-op math; inter-op parallelism only adds contention
+        torch.set_num_threads(os.cpu_count() or 1)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # Already fixed once torch has run parallel work
+        return "cpu"
+
     def embed(self, text: str) -> np.ndarray:
         """Generate embedding for text using the best available provider."""
         if self.provider_name == "sentence-transformers":
@@ -95,17 +160,26 @@ class EmbeddingProvider:
     def embed_batch(self, texts: list[str]) -> np.ndarray:
         """Generate embeddings for multiple texts (more efficient)."""
         if self.provider_name == "sentence-transformers":
-            embeddings = self.model.encode(texts, convert_to_numpy=True)
-            return embeddings.astype(np.float32)
+            # Unit-length output: cosine needs no further normalization downstream
+            embeddings = self.model.encode(
+                texts,
+                batch_size=self.ENCODE_BATCH_SIZE,
+                device=self._device,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+            return embeddings.astype(np.float32, copy=False)
         elif self.provider_name == "openai":
             return np.array([self._embed_openai(t) for t in texts], dtype=np.float32)
         else:
-            return np.array([self._embed_hash_fallback(t) for t in texts], dtype=np.float32)
+            return _hash_embeddings(texts, self.dimension)
 
     def _embed_sentence_transformers(self, text: str) -> np.ndarray:
         """Embed using sentence-transformers."""
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.astype(np.float32)
+        embedding = self.model.encode(
+            text, device=self._device, convert_to_numpy=True, normalize_embeddings=True
+        )
+        return embedding.astype(np.float32, copy=False)
 
     def _embed_openai(self, text: str) -> np.ndarray:
         """Embed using OpenAI API (synchronous - use embed_async for async contexts)."""
@@ -118,36 +192,85 @@ class EmbeddingProvider:
 
     async def embed_async(self, text: str) -> np.ndarray:
         """Generate embedding asynchronously (safe for async contexts)."""
-        import asyncio
-
         return await asyncio.to_thread(self.embed, text)
 
     async def embed_batch_async(self, texts: list[str]) -> np.ndarray:
         """Generate embeddings for multiple texts asynchronously."""
-        import asyncio
-
         return await asyncio.to_thread(self.embed_batch, texts)
 
     def _embed_hash_fallback(self, text: str) -> np.ndarray:
         """Deterministic hash-based fallback (not semantic, but consistent)."""
-        hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
-        # Use local RNG to avoid mutating global random state
-        rng = np.random.default_rng(hash_val % (2**32))
-        return rng.standard_normal(self.dimension).astype(np.float32)
+        return _hash_embedding(text, self.dimension)
 
     @staticmethod
     def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
         """Compute cosine similarity between two vectors."""
-        norm_a = np.linalg.norm(a)
-        norm_b = np.linalg.norm(b)
-        if norm_a == 0 or norm_b == 0:
+        # Squared norms via vdot avoid norm() dispatch and fold two sqrts into one
+        norm_sq_a = np.vdot(a, a)
+        norm_sq_b = np.vdot(b, b)
+        if norm_sq_a == 0 or norm_sq_b == 0:
             return 0.0
-        return float(np.dot(a, b) / (norm_a * norm_b))
+        return float(np.dot(a, b) / np.sqrt(norm_sq_a * norm_sq_b))
 
 
 class MemorySystem:
     """Hybrid memory system with episodic and semantic storage."""
 
+    # FAISS index layouts: int8 scalar quantization (4x smaller than float32),
+    # switching from flat scan to HNSW above ANN_INDEX_THRESHOLD vectors
+    # (MEMORY_ANN_THRESHOLD overrides it; 0 keeps the flat scan at any size)
+    FLAT_INDEX_FACTORY = "SQ8"
+    ANN_INDEX_FACTORY = "HNSW32,SQ8"
+    ANN_INDEX_THRESHOLD = 10_000
+    ANN_EF_CONSTRUCTION = 80  # HNSW build breadth (graph quality vs insert cost)
+    ANN_EF_SEARCH = 64  # HNSW search breadth (recall vs latency)
+    # long_term key recording which embedding model/dimension built the index
+    INDEX_SCHEME_KEY = "semantic_index_scheme"
+
+    EMBED_CACHE_SIZE = 4096  # cached text embeddings (LRU eviction)
+    EMBED_STORE_MAX_ROWS = 50_000  # persisted embeddings (oldest evicted first)
+
+    # Seconds a connection waits on another thread's write lock before SQLITE_BUSY
+    DB_BUSY_TIMEOUT = 5.0
+    # Per-connection prepared statement cache (sqlite3 default is 128)
+    DB_CACHED_STATEMENTS = 256
+
+    # Group commits: flush after this many writes, or this many seconds after the first
+    COMMIT_EVERY = 32
+    COMMIT_INTERVAL = 1.0
+
+    # Upper bound on pooled read-only connections shared by all threads
+    READ_POOL_SIZE = os.cpu_count() or 4
+
+    # Kept as constants so SQLite's per-connection statement cache reuses the plans
+    _INSERT_EPISODE_SQL = """
+        INSERT INTO episodes (timestamp, event_type, content, valence, metadata)
+        VALUES (?, ?, ?, ?, ?)
+    """
+    _INSERT_TURN_SQL = """
+        INSERT INTO turns (timestamp, user_input, assistant_response, metadata)
+        VALUES (?, ?, ?, ?)
+    """
+    # context is capped at 2000 characters by SQLite rather than a Python slice copy
+    _INSERT_UNCERTAINTY_SQL = """
+        INSERT INTO uncertainty_log
+        (timestamp, user_message, parsed_intent, confidence_score, context, signals)
+        VALUES (?, ?, ?, ?, substr(?, 1, 2000), ?)
+    """
+    _SELECT_UNCERTAINTY_SQL = """
+        SELECT id, timestamp, user_message, parsed_intent,
+               confidence_score, context, signals, resolved, resolution_pattern
+        FROM uncertainty_log
+        WHERE confidence_score >= ? AND confidence_score <= ?{}
+        ORDER BY timestamp DESC LIMIT ?
+    """
+    # One fixed text per filter variant; the resolved filter stays a literal so
+    # the planner can still use idx_uncert_resolved
+    _SELECT_UNCERTAINTY_SQL_BY_FILTER = {
+        False: _SELECT_UNCERTAINTY_SQL.format(""),
+        True: _SELECT_UNCERTAINTY_SQL.format(" AND resolved = 0"),
+    }
+
     def __init__(self, state_dir: str = "state"):
         self.state_dir = Path(state_dir)
         self.state_dir.mkdir(exist_ok=True)
@@ -156,38 +279,146 @@ class MemorySystem:
         self.embeddings_path = self.state_dir / "embeddings"
         self.embeddings_path.mkdir(exist_ok=True)
 
-        self.db = None
+        # One SQLite connection per thread (see the db property)
+        self._db_local = threading.local()
+        self._db_ready = False
+        self._pending_writes = 0
+        # Read-only connections checked out by _read_conn(), opened lazily
+        self._readers: queue.Queue[sqlite3.Connection] = queue.Queue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
         self.vector_store = None
+        ann_threshold = os.getenv("MEMORY_ANN_THRESHOLD")
+        if ann_threshold:
+            self.ANN_INDEX_THRESHOLD = int(ann_threshold)
         self.embedding_provider: Optional[EmbeddingProvider] = None
         self.dimension = 384  # Updated after embedding provider init
 
         # Semantic memory index mapping (FAISS index -> DB id)
-        self.semantic_id_map: list[int] = []
+        # Packed int64 array: no per-element int objects, binary save/load
+        self.semantic_id_map = array.array("q")
+        # Set when vectors are added; save_state skips the index write otherwise
+        self._index_dirty = False
+        # Serializes save_state; created inside the running loop on first save
+        self._save_lock: Optional[asyncio.Lock] = None
 
         self.last_activity_time = time.time()
         self.current_turn = 0
         self.max_context_length = 8192
 
-        # Recent context embeddings for coherence tracking
-        self._context_embeddings: list[np.ndarray] = []
+        # Recent context embeddings for coherence tracking: a ring buffer of
+        # normalized rows, slot = write count % capacity
         self._max_context_embeddings = 20
+        self._init_context_buffer()
+
+        # Embeddings keyed by text digest; embed() may run on worker threads
+        self._embed_cache: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._embed_cache_lock = threading.Lock()
+        self._embed_store_rows: Optional[int] = None  # counted on first store
 
     async def initialize(self):
         """Initialize database, embedding provider, and vector store."""
         # Initialize embedding provider first (determines dimension)
         self.embedding_provider = EmbeddingProvider()
         self.dimension = self.embedding_provider.dimension
+        self._embed_cache.clear()  # Provider (and dimension) may have changed
+        self._embed_store_rows = None
+        self._init_context_buffer()
 
         self._init_database()
         self._init_vector_store()
         self._load_persistent_state()
         self._rebuild_semantic_index()
 
+    @property
+    def db(self) -> Optional[sqlite3.Connection]:
+        """
+        SQLite connection for the calling thread (None before initialize).
+        Threads used by asyncio.to_thread get their own connection, so reads
+        run concurrently instead of serializing on one shared connection.
+        """
+        if not self._db_ready:
+            return None
+        conn = getattr(self._db_local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            # Take the write lock up front instead of upgrading mid-transaction
+            conn.isolation_level = "IMMEDIATE"
+            self._db_local.conn = conn
+        return conn
+
+    @contextmanager
+    def _read_conn(self):
+        """
+        Check out a read-only connection so reads overlap with writes.
+        While this thread has uncommitted writes, its own connection is used
+        instead so callers still read what they just wrote.
+        """
+        writer = getattr(self._db_local, "conn", None)
+        if writer is not None and writer.in_transaction:
+            yield writer
+            return
+
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._reader_lock:
+                create = self._reader_count < self.READ_POOL_SIZE
+                if create:
+                    self._reader_count += 1
+            if create:
+                conn = self._connect(check_same_thread=False)
+                conn.execute("PRAGMA query_only=1")
+            else:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        """Open a connection with per-connection performance pragmas."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.DB_BUSY_TIMEOUT,
+            check_same_thread=check_same_thread,
+            cached_statements=self.DB_CACHED_STATEMENTS,
+        )
+        # WAL + NORMAL sync: commits append to the log instead of fsyncing the
+        # main file each time, and readers no longer block on the writer
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        conn.execute("PRAGMA cache_size=-65536")  # 64 MiB
+        return conn
+
+    def _maybe_commit(self):
+        """
+        Count a write and commit in groups instead of once per row.
+        Commits every COMMIT_EVERY writes; a loop timer flushes the remainder
+        COMMIT_INTERVAL seconds after the first pending write, so idle sessions
+        never leave rows uncommitted. Without a running loop, commits at once.
+        """
+        self._pending_writes += 1
+        if self._pending_writes >= self.COMMIT_EVERY:
+            self.flush()
+        elif self._pending_writes == 1:
+            try:
+                asyncio.get_running_loop().call_later(self.COMMIT_INTERVAL, self.flush)
+            except RuntimeError:
+                self.flush()
+
+    def flush(self):
+        """Commit this thread's pending writes."""
+        self._pending_writes = 0
+        db = self.db
+        if db is not None and db.in_transaction:
+            db.commit()
+
     def _init_database(self):
         """Initialize SQLite database for structured memory."""
-        # Use check_same_thread=False for async contexts where DB may be accessed
-        # from different threads. We rely on SQLite's internal serialization.
-        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db_ready = True
         cursor = self.db.cursor()
 
         # Episodic memory table
@@ -237,6 +468,19 @@ class MemorySystem:
             )
         """)
 
+        # Model embeddings of ingested texts keyed by digest of (model id, text),
+        # float32 bytes; capped at EMBED_STORE_MAX_ROWS, oldest evicted first
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS embed_cache (
+                hash BLOB PRIMARY KEY,
+                vec BLOB,
+                stored_at REAL
+            ) WITHOUT ROWID
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embed_cache_stored_at ON embed_cache(stored_at)"
+        )
+
         # Semantic memories for vector search
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS semantic_memories (
@@ -249,26 +493,97 @@ class MemorySystem:
             )
         """)
 
+        # Indexes for hot filters and orderings (episodes.id is already the rowid)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sem_cat ON semantic_memories(category)")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_uncert_ts ON uncertainty_log(timestamp DESC)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_uncert_resolved "
+            "ON uncertainty_log(resolved, timestamp DESC)"
+        )
+        # Harvest narrows logs to a confidence band before ordering by time
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_uncert_conf ON uncertainty_log(confidence_score)"
+        )
+
         self.db.commit()
 
     def _init_vector_store(self):
         """Initialize FAISS vector store for semantic search."""
         if FAISS_AVAILABLE:
+            faiss.omp_set_num_threads(os.cpu_count() or 1)
             index_path = self.embeddings_path / "index.faiss"
-            id_map_path = self.embeddings_path / "id_map.json"
 
             if index_path.exists():
                 self.vector_store = faiss.read_index(str(index_path))
-                # Load ID mapping
-                if id_map_path.exists():
-                    with open(id_map_path) as f:
-                        self.semantic_id_map = json.load(f)
+                self._load_id_map()
             else:
-                # Use IndexFlatIP for cosine similarity (after L2 normalization)
-                self.vector_store = faiss.IndexFlatIP(self.dimension)
+                self.vector_store = self._new_faiss_index(0)
         else:
-            # Fallback: in-memory list of (embedding, db_id) tuples
-            self.vector_store = []
+            # Fallback: contiguous matrix of normalized rows, aligned with semantic_id_map
+            self.vector_store = self._new_fallback_store()
+
+    def _load_id_map(self):
+        """Load the FAISS-row -> DB id mapping (binary .npy, or legacy JSON)."""
+        npy_path = self.embeddings_path / "id_map.npy"
+        json_path = self.embeddings_path / "id_map.json"
+        if npy_path.exists():
+            # Memory-mapped load copied straight into the packed array, no parsing
+            ids = np.load(npy_path, mmap_mode="r")
+            self.semantic_id_map = array.array("q")
+            packed = np.ascontiguousarray(ids, dtype=np.int64)
+            self.semantic_id_map.frombytes(memoryview(packed).cast("B"))
+        elif json_path.exists():
+            with open(json_path) as f:
+                self.semantic_id_map = array.array("q", json.load(f))
+
+    def _new_faiss_index(self, count: int):
+        """
+        Create an empty inner-product index sized for count vectors.
+        Small corpora use a flat scan; larger ones use HNSW so search cost
+        grows roughly logarithmically instead of linearly.
+        """
+        large = self._ann_enabled() and count > self.ANN_INDEX_THRESHOLD
+        factory = self.ANN_INDEX_FACTORY if large else self.FLAT_INDEX_FACTORY
+        index = faiss.index_factory(self.dimension, factory, faiss.METRIC_INNER_PRODUCT)
+        # Vectors are L2-normalized, so every component lies in [-1, 1]: training
+        # the quantizer on that range up front means no data buffering is needed
+        index.train(
+            np.vstack([-np.ones(self.dimension), np.ones(self.dimension)]).astype(np.float32)
+        )
+        if large:
+            index.hnsw.efConstruction = self.ANN_EF_CONSTRUCTION
+            index.hnsw.efSearch = self.ANN_EF_SEARCH
+        return index
+
+    def _ann_enabled(self) -> bool:
+        """Whether large indexes may switch to HNSW (threshold 0 disables it)."""
+        return self.ANN_INDEX_THRESHOLD > 0
+
+    def _maybe_upgrade_index(self):
+        """Migrate a flat index to HNSW once it outgrows ANN_INDEX_THRESHOLD."""
+        index = self.vector_store
+        if isinstance(index, faiss.IndexHNSW) or not self._ann_enabled():
+            return
+        if index.ntotal <= self.ANN_INDEX_THRESHOLD:
+            return
+        vectors = index.reconstruct_n(0, index.ntotal)
+        self.vector_store = self._new_faiss_index(index.ntotal)
+        self.vector_store.add(vectors)
+
+    def _new_fallback_store(self, capacity: int = 64) -> np.ndarray:
+        """Preallocate the no-FAISS embedding matrix (rows filled as memories arrive)."""
+        return np.zeros((max(capacity, 1), self.dimension), dtype=np.float32)
+
+    def _append_fallback_rows(self, rows: np.ndarray, start: int):
+        """Write rows at start, doubling the fallback matrix capacity when full."""
+        end = start + len(rows)
+        if end > len(self.vector_store):
+            grown = self._new_fallback_store(max(end, 2 * len(self.vector_store)))
+            grown[:start] = self.vector_store[:start]
+            self.vector_store = grown
+        self.vector_store[start:end] = rows
 
     def _rebuild_semantic_index(self):
         """Rebuild vector index from database (on startup if needed)."""
@@ -279,84 +594,217 @@ class MemorySystem:
         cursor.execute("SELECT id, content FROM semantic_memories ORDER BY id")
         rows = cursor.fetchall()
 
+        # Vectors from a different embedding scheme cannot be compared with new
+        # query embeddings, so a scheme change forces a full rebuild
+        scheme = f"{self.embedding_provider.model_id}/{self.dimension}"
+        same_scheme = self.retrieve_persistent(self.INDEX_SCHEME_KEY) == scheme
+
         if not rows:
+            if not same_scheme:
+                self._record_index_scheme(scheme)
             return
 
         # Check if index needs rebuilding
         current_count = len(self.semantic_id_map) if self.semantic_id_map else 0
-        if current_count == len(rows):
+        if current_count == len(rows) and same_scheme:
             return  # Already in sync
 
         print(f"Rebuilding semantic index for {len(rows)} memories...")
 
         # Reset index
         if FAISS_AVAILABLE:
-            self.vector_store = faiss.IndexFlatIP(self.dimension)
+            self.vector_store = self._new_faiss_index(len(rows))
         else:
-            self.vector_store = []
+            self.vector_store = self._new_fallback_store(len(rows))
 
-        self.semantic_id_map = []
+        self.semantic_id_map = array.array("q")
 
-        # Batch embed all content
+        # Batch embed all content, normalized for cosine similarity
         ids = [row[0] for row in rows]
         texts = [row[1] for row in rows]
-        embeddings = self.embedding_provider.embed_batch(texts)
-
-        # Normalize for cosine similarity
-        faiss.normalize_L2(embeddings) if FAISS_AVAILABLE else None
+        embeddings = self._normalized_rows(self.embedding_provider.embed_batch(texts))
 
         # Add to index
         if FAISS_AVAILABLE:
             self.vector_store.add(embeddings)
         else:
-            for i, emb in enumerate(embeddings):
-                self.vector_store.append((emb, ids[i]))
+            self._append_fallback_rows(embeddings, 0)
 
-        self.semantic_id_map = ids
+        self.semantic_id_map = array.array("q", ids)
+        self._index_dirty = True
+        self._record_index_scheme(scheme)
         print(f"✓ Semantic index rebuilt with {len(ids)} memories")
 
+    def _record_index_scheme(self, scheme: str):
+        """Persist the embedding scheme behind the index, committing it immediately."""
+        self.store_persistent(self.INDEX_SCHEME_KEY, scheme)
+        self.flush()
+
     def embed(self, text: str) -> np.ndarray:
-        """Generate embedding for text using the configured provider."""
+        """
+        Generate embedding for text using the configured provider.
+        Results are LRU-cached and returned read-only.
+        """
+        key = self._embed_key(text)
+        cached = self._cached_embedding(key)
+        if cached is not None:
+            return cached
+        stored = self._load_stored_embeddings([key])
+        if stored:
+            return self._remember_embedding(key, stored[key])
         if self.embedding_provider:
-            return self.embedding_provider.embed(text)
-        # Fallback if provider not initialized - use local RNG to avoid mutating global state
-        hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
-        rng = np.random.default_rng(hash_val % (2**32))
-        return rng.standard_normal(self.dimension).astype(np.float32)
+            embedding = self.embedding_provider.embed(text)
+        else:
+            # Fallback if provider not initialized
+            embedding = _hash_embedding(text, self.dimension)
+        return self._remember_embedding(key, embedding)
 
     def embed_batch(self, texts: list[str]) -> np.ndarray:
-        """Generate embeddings for multiple texts (more efficient)."""
-        if self.embedding_provider:
-            return self.embedding_provider.embed_batch(texts)
-        return np.array([self.embed(t) for t in texts], dtype=np.float32)
+        """Generate embeddings for multiple texts, sending only cache misses to the model."""
+        return self._embed_batch(texts, persist=False)
+
+    def _embed_batch(self, texts: list[str], persist: bool) -> np.ndarray:
+        """
+        Batch embedding behind embed_batch. Only ingest paths pass persist=True,
+        so queries and checks read the embed_cache table but never write to it.
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        keys = [self._embed_key(text) for text in texts]
+        embeddings = [self._cached_embedding(key) for key in keys]
+        missing = [i for i, emb in enumerate(embeddings) if emb is None]
+        if missing:
+            stored = self._load_stored_embeddings([keys[i] for i in missing])
+            for i in missing:
+                if keys[i] in stored:
+                    embeddings[i] = self._remember_embedding(keys[i], stored[keys[i]])
+            missing = [i for i in missing if embeddings[i] is None]
+        if missing:
+            miss_texts = [texts[i] for i in missing]
+            if self.embedding_provider:
+                fresh = self.embedding_provider.embed_batch(miss_texts)
+                if persist:
+                    self._store_embeddings([keys[i] for i in missing], fresh)
+            else:
+                fresh = _hash_embeddings(miss_texts, self.dimension)
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = self._remember_embedding(keys[i], embedding)
+        return np.stack(embeddings).astype(np.float32, copy=False)
+
+    def _embed_key(self, text: str) -> bytes:
+        """Compact cache key for a text under the current embedding model."""
+        model_id = self.embedding_provider.model_id if self.embedding_provider else ""
+        return hashlib.blake2b(f"{model_id}\0{text}".encode(), digest_size=16).digest()
+
+    def _persist_embeddings(self) -> bool:
+        """Model embeddings are worth a disk lookup; hash-fallback ones are not."""
+        return (
+            self._db_ready
+            and self.embedding_provider is not None
+            and self.embedding_provider.provider_name != "hash-fallback"
+        )
+
+    def _load_stored_embeddings(self, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        """Fetch embeddings computed in earlier sessions from the embed_cache table."""
+        if not keys or not self._persist_embeddings():
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._read_conn() as conn:
+            rows = conn.execute(
+                f"SELECT hash, vec FROM embed_cache WHERE hash IN ({placeholders})", keys
+            ).fetchall()
+        # frombuffer views the blob without copying; the result is read-only
+        return {key: np.frombuffer(vec, dtype=np.float32) for key, vec in rows}
+
+    def _store_embeddings(self, keys: list[bytes], embeddings) -> None:
+        """Persist freshly computed model embeddings for later sessions."""
+        if not keys or not self._persist_embeddings():
+            return
+        if self._embed_store_rows is None:
+            (self._embed_store_rows,) = self.db.execute(
+                "SELECT COUNT(*) FROM embed_cache"
+            ).fetchone()
+        now = time.time()
+        cursor = self.db.executemany(
+            "INSERT OR IGNORE INTO embed_cache (hash, vec, stored_at) VALUES (?, ?, ?)",
+            [
+                (key, np.asarray(emb, dtype=np.float32).tobytes(), now)
+                for key, emb in zip(keys, embeddings)
+            ],
+        )
+        self._embed_store_rows += cursor.rowcount
+        excess = self._embed_store_rows - self.EMBED_STORE_MAX_ROWS
+        if excess > 0:
+            self.db.execute(
+                """
+                DELETE FROM embed_cache WHERE hash IN (
+                    SELECT hash FROM embed_cache ORDER BY stored_at LIMIT ?
+                )
+                """,
+                (excess,),
+            )
+            self._embed_store_rows -= excess
+        self._maybe_commit()
+
+    def _cached_embedding(self, key: bytes) -> Optional[np.ndarray]:
+        """Look up an embedding in the LRU cache."""
+        with self._embed_cache_lock:
+            cached = self._embed_cache.get(key)
+            if cached is not None:
+                self._embed_cache.move_to_end(key)
+            return cached
+
+    def _remember_embedding(self, key: bytes, embedding: np.ndarray) -> np.ndarray:
+        """Insert an embedding into the LRU cache."""
+        # Cached arrays are shared between callers, so freeze them
+        embedding.flags.writeable = False
+        with self._embed_cache_lock:
+            self._embed_cache[key] = embedding
+            if len(self._embed_cache) > self.EMBED_CACHE_SIZE:
+                self._embed_cache.popitem(last=False)
+        return embedding
 
     def store_episodic(self, event: str, content: dict[str, Any], valence: float = 0.0):
         """Store episodic memory."""
-        cursor = self.db.cursor()
-        cursor.execute(
-            """
-            INSERT INTO episodes (timestamp, event_type, content, valence, metadata)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (time.time(), event, json.dumps(content), valence, json.dumps({})),
+        self.db.execute(
+            self._INSERT_EPISODE_SQL, (time.time(), event, _dumps(content), valence, _EMPTY_JSON)
         )
-        self.db.commit()
+        self._maybe_commit()
+
+    def store_episodic_batch(self, entries: list[tuple[str, dict[str, Any], float]]) -> int:
+        """
+        Store several episodic memories in one transaction.
+        Each entry is (event, content, valence). Returns the number written.
+        """
+        if not entries:
+            return 0
+        now = time.time()
+        self.db.executemany(
+            self._INSERT_EPISODE_SQL,
+            [
+                (now, event, _dumps(content), valence, _EMPTY_JSON)
+                for event, content, valence in entries
+            ],
+        )
+        self.flush()
+        return len(entries)
 
     def retrieve_recent_episodic(self, n: int = 100) -> list[dict]:
         """Retrieve recent episodic memories."""
-        cursor = self.db.cursor()
-        cursor.execute(
-            """
-            SELECT event_type, content, valence, timestamp
-            FROM episodes
-            ORDER BY id DESC
-            LIMIT ?
-            """,
-            (n,),
-        )
+        with self._read_conn() as conn:
+            rows = conn.execute(
+                """
+                SELECT event_type, content, valence, timestamp
+                FROM episodes
+                ORDER BY id DESC
+                LIMIT ?
+                """,
+                (n,),
+            ).fetchall()
 
         results = []
-        for row in cursor.fetchall():
+        for row in rows:
             results.append(
                 {
                     "event": row[0],
@@ -371,17 +819,26 @@ class MemorySystem:
     def store_turn(self, user_input: str, assistant_response: str):
         """Store conversation turn."""
         self.current_turn += 1
-        self.last_activity_time = time.time()
+        now = self.last_activity_time = time.time()
 
-        cursor = self.db.cursor()
-        cursor.execute(
-            """
-            INSERT INTO turns (timestamp, user_input, assistant_response, metadata)
-            VALUES (?, ?, ?, ?)
-            """,
-            (time.time(), user_input, assistant_response, json.dumps({})),
+        self.db.execute(self._INSERT_TURN_SQL, (now, user_input, assistant_response, _EMPTY_JSON))
+        self._maybe_commit()
+
+    def store_turn_batch(self, turns: list[tuple[str, str]]) -> int:
+        """
+        Store several (user_input, assistant_response) turns in one transaction.
+        Returns the number written.
+        """
+        if not turns:
+            return 0
+        self.current_turn += len(turns)
+        now = self.last_activity_time = time.time()
+        self.db.executemany(
+            self._INSERT_TURN_SQL,
+            [(now, user_input, response, _EMPTY_JSON) for user_input, response in turns],
         )
-        self.db.commit()
+        self.flush()
+        return len(turns)
 
     def store_persistent(self, key: str, value: Any):
         """Store persistent key-value data."""
@@ -391,15 +848,14 @@ class MemorySystem:
             INSERT OR REPLACE INTO long_term (key, value, updated_at)
             VALUES (?, ?, ?)
             """,
-            (key, json.dumps(value), time.time()),
+            (key, _dumps(value), time.time()),
         )
-        self.db.commit()
+        self._maybe_commit()
 
     def retrieve_persistent(self, key: str) -> Optional[Any]:
         """Retrieve persistent data."""
-        cursor = self.db.cursor()
-        cursor.execute("SELECT value FROM long_term WHERE key = ?", (key,))
-        row = cursor.fetchone()
+        with self._read_conn() as conn:
+            row = conn.execute("SELECT value FROM long_term WHERE key = ?", (key,)).fetchone()
         return json.loads(row[0]) if row else None
 
     def _load_persistent_state(self):
@@ -425,56 +881,72 @@ class MemorySystem:
         Store a semantic memory with vector embedding.
         Returns the memory ID.
         """
-        cursor = self.db.cursor()
-        cursor.execute(
-            """
-            INSERT INTO semantic_memories (timestamp, content, category, importance, metadata)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (time.time(), content, category, importance, json.dumps(metadata or {})),
-        )
-        self.db.commit()
-        memory_id = cursor.lastrowid
+        return self.store_semantic_batch([content], category, importance, metadata)[0]
 
-        # Generate and store embedding
-        embedding = self.embed(content)
+    def store_semantic_batch(
+        self,
+        contents: list[str],
+        category: str = "general",
+        importance: float = 0.5,
+        metadata: Optional[dict] = None,
+    ) -> list[int]:
+        """
+        Store several semantic memories with one commit, one batched embed
+        and one vector-store add. Returns the memory IDs in input order.
+        """
+        if not contents:
+            return []
 
-        # Normalize for cosine similarity
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = embedding / norm
+        now = time.time()
+        metadata_json = _dumps(metadata) if metadata else _EMPTY_JSON
+        cursor = self.db.cursor()
+        memory_ids = []
+        for content in contents:
+            cursor.execute(
+                """
+                INSERT INTO semantic_memories (timestamp, content, category, importance, metadata)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (now, content, category, importance, metadata_json),
+            )
+            memory_ids.append(cursor.lastrowid)
+        self.flush()
+
+        # Generate and store embeddings, normalized for cosine similarity
+        embeddings = self._normalized_rows(self._embed_batch(contents, persist=True))
 
         # Add to vector store
         if FAISS_AVAILABLE:
-            self.vector_store.add(embedding.reshape(1, -1))
+            self.vector_store.add(embeddings)
+            self._maybe_upgrade_index()
         else:
-            self.vector_store.append((embedding, memory_id))
+            self._append_fallback_rows(embeddings, len(self.semantic_id_map))
 
-        self.semantic_id_map.append(memory_id)
+        self.semantic_id_map.extend(memory_ids)
+        self._index_dirty = True
 
-        return memory_id
+        return memory_ids
 
-    def search_semantic(
-        self, query: str, k: int = 5, category: Optional[str] = None, min_similarity: float = 0.0
-    ) -> list[dict]:
+    @staticmethod
+    def _normalized_rows(embeddings: np.ndarray) -> np.ndarray:
+        """Return embeddings as a fresh L2-normalized (n, d) float32 matrix."""
+        rows = np.array(embeddings, dtype=np.float32)
+        rows = rows.reshape(-1, rows.shape[-1])
+        if FAISS_AVAILABLE:
+            faiss.normalize_L2(rows)  # SIMD in-place kernel
+        else:
+            norms = np.linalg.norm(rows, axis=1, keepdims=True)
+            np.divide(rows, norms, out=rows, where=norms > 0)
+        return rows
+
+    def _search_semantic_ids(
+        self, query_embedding: np.ndarray, k: int, min_similarity: float
+    ) -> list[tuple[int, float]]:
         """
-        Search semantic memories by similarity to query.
-        Returns list of memories with similarity scores.
+        Vector-store search only: (memory id, similarity) candidates, best first.
+        Returns up to 2k candidates so callers can still drop rows after filtering.
         """
-        if not self.semantic_id_map:
-            return []
-
-        # Generate query embedding
-        query_embedding = self.embed(query)
-
-        # Normalize for cosine similarity
-        norm = np.linalg.norm(query_embedding)
-        if norm > 0:
-            query_embedding = query_embedding / norm
-
-        # Search vector store
         if FAISS_AVAILABLE:
-            query_embedding = query_embedding.reshape(1, -1)
             similarities, indices = self.vector_store.search(
                 query_embedding, min(k * 2, len(self.semantic_id_map))
             )
@@ -486,32 +958,54 @@ class MemorySystem:
                     continue
                 db_id = self.semantic_id_map[idx]
                 results.append((db_id, float(sim)))
-        else:
-            # Fallback: linear search
-            similarities = []
-            for emb, db_id in self.vector_store:
-                sim = EmbeddingProvider.cosine_similarity(query_embedding, emb)
-                if sim >= min_similarity:
-                    similarities.append((db_id, sim))
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            results = similarities[: k * 2]
+            return results
+
+        # Fallback: one matmul over the normalized rows, then partial top-k
+        sims = self.vector_store[: len(self.semantic_id_map)] @ query_embedding[0]
+        return [
+            (self.semantic_id_map[i], float(sims[i]))
+            for i in _top_k_indices(sims, k * 2)
+            if sims[i] >= min_similarity
+        ]
+
+    def search_semantic(
+        self, query: str, k: int = 5, category: Optional[str] = None, min_similarity: float = 0.0
+    ) -> list[dict]:
+        """
+        Search semantic memories by similarity to query.
+        Returns list of memories with similarity scores.
+        """
+        if not self.semantic_id_map:
+            return []
+
+        # Generate query embedding, normalized for cosine similarity
+        query_embedding = self._normalized_rows(self.embed(query))
+        results = self._search_semantic_ids(query_embedding, k, min_similarity)
 
         # Fetch from database
-        memories = []
+        candidates = results[:k]
+        if not candidates:
+            return []
+
+        # One IN (...) query for all candidates, re-ordered by similarity below
+        ids = [db_id for db_id, _ in candidates]
+        query_sql = f"""
+            SELECT id, timestamp, content, category, importance, metadata
+            FROM semantic_memories WHERE id IN ({",".join("?" * len(ids))})
+        """
+        params = ids
+        if category:
+            # Filter by category in SQL rather than discarding rows afterwards
+            query_sql += " AND category = ?"
+            params = ids + [category]
         cursor = self.db.cursor()
-        for db_id, similarity in results[:k]:
-            cursor.execute(
-                """
-                SELECT id, timestamp, content, category, importance, metadata
-                FROM semantic_memories WHERE id = ?
-                """,
-                (db_id,),
-            )
-            row = cursor.fetchone()
+        cursor.execute(query_sql, params)
+        rows = {row[0]: row for row in cursor.fetchall()}
+
+        memories = []
+        for db_id, similarity in candidates:
+            row = rows.get(db_id)
             if row:
-                # Filter by category if specified
-                if category and row[3] != category:
-                    continue
                 memories.append(
                     {
                         "id": row[0],
@@ -540,23 +1034,34 @@ class MemorySystem:
             recent = self.retrieve_recent_episodic(n=20)
             if recent and self.embedding_provider:
                 text_emb = self.embed(text)
-                scored = []
-                for ep in recent:
-                    content_str = json.dumps(ep["content"])
-                    ep_emb = self.embed(content_str)
-                    sim = EmbeddingProvider.cosine_similarity(text_emb, ep_emb)
-                    scored.append((ep, sim))
-                scored.sort(key=lambda x: x[1], reverse=True)
-                result["episodic"] = [{**ep, "similarity": sim} for ep, sim in scored[:k]]
+                # One batched embed plus one matmul instead of per-episode calls
+                ep_embs = self.embed_batch([json.dumps(ep["content"]) for ep in recent])
+                ep_norms = np.linalg.norm(ep_embs, axis=1)
+                text_norm = np.linalg.norm(text_emb)
+                denom = np.where(ep_norms > 0, ep_norms, 1.0) * (text_norm or 1.0)
+                sims = (ep_embs @ text_emb) / denom
+
+                result["episodic"] = [
+                    {**recent[i], "similarity": float(sims[i])} for i in _top_k_indices(sims, k)
+                ]
 
         return result
 
     def track_context_embedding(self, text: str):
         """Track embedding for coherence drift detection."""
         emb = self.embed(text)
-        self._context_embeddings.append(emb)
-        if len(self._context_embeddings) > self._max_context_embeddings:
-            self._context_embeddings.pop(0)
+        # Store L2-normalized float16 rows: drift detection is a plain matmul and
+        # half precision is ample for comparing against a ~0.7 threshold
+        norm = np.linalg.norm(emb)
+        if norm > 0:
+            emb = emb / norm
+        self._ctx_buf[self._ctx_count % self._max_context_embeddings] = emb
+        self._ctx_count += 1
+
+    def _init_context_buffer(self):
+        """Allocate an empty context ring buffer for the current dimension."""
+        self._ctx_buf = np.zeros((self._max_context_embeddings, self.dimension), dtype=np.float16)
+        self._ctx_count = 0
 
     def grounding_confidence(self, text: str) -> float:
         """
@@ -566,18 +1071,30 @@ class MemorySystem:
         if not self.semantic_id_map:
             return 0.5  # Neutral if no memories stored
 
-        # Search for similar memories
-        similar = self.search_semantic(text, k=3, min_similarity=0.3)
+        # Search for similar memories: ids and scores only, then just their importance
+        candidates = self._search_semantic_ids(
+            self._normalized_rows(self.embed(text)), k=3, min_similarity=0.3
+        )[:3]
+        matches = []  # (similarity, importance), best first
+        if candidates:
+            ids = [db_id for db_id, _ in candidates]
+            cursor = self.db.cursor()
+            cursor.execute(
+                "SELECT id, importance FROM semantic_memories "
+                f"WHERE id IN ({','.join('?' * len(ids))})",
+                ids,
+            )
+            importance = dict(cursor.fetchall())
+            matches = [(sim, importance[db_id]) for db_id, sim in candidates if db_id in importance]
 
-        if not similar:
+        if not matches:
             return 0.3  # Low confidence - no similar memories
 
         # Weight by similarity and importance
         weighted_sum = 0.0
         weight_total = 0.0
-        for mem in similar:
-            weight = mem["importance"]
-            weighted_sum += mem["similarity"] * weight
+        for similarity, weight in matches:
+            weighted_sum += similarity * weight
             weight_total += weight
 
         if weight_total == 0:
@@ -587,7 +1104,7 @@ class MemorySystem:
         confidence = weighted_sum / weight_total
 
         # Boost slightly if multiple strong matches
-        if len(similar) >= 2 and similar[1]["similarity"] > 0.6:
+        if len(matches) >= 2 and matches[1][0] > 0.6:
             confidence = min(1.0, confidence * 1.1)
 
         return confidence
@@ -597,37 +1114,27 @@ class MemorySystem:
         Detect if context coherence has drifted using embedding similarity.
         Returns True if recent context is incoherent (drifted).
         """
-        if len(self._context_embeddings) < 3:
+        filled = min(self._ctx_count, self._max_context_embeddings)
+        if filled < 3:
             return False  # Not enough context to judge
 
-        # Compare recent embeddings to earlier ones
-        recent = self._context_embeddings[-3:]
-        earlier = self._context_embeddings[:-3] if len(self._context_embeddings) > 3 else []
-
-        if not earlier:
-            # Compare within recent only
-            similarities = []
-            for i in range(len(recent)):
-                for j in range(i + 1, len(recent)):
-                    sim = EmbeddingProvider.cosine_similarity(recent[i], recent[j])
-                    similarities.append(sim)
-            if similarities:
-                avg_sim = sum(similarities) / len(similarities)
-                return avg_sim < threshold
-            return False
-
-        # Compare recent to earlier
-        cross_similarities = []
-        for r in recent:
-            for e in earlier:
-                sim = EmbeddingProvider.cosine_similarity(r, e)
-                cross_similarities.append(sim)
+        # Rows are L2-normalized, so dot products are cosine similarities
+        context = self._ctx_buf[:filled].astype(np.float32)
+        recent_slots = (
+            np.arange(self._ctx_count - 3, self._ctx_count) % self._max_context_embeddings
+        )
+        earlier_mask = np.ones(filled, dtype=bool)
+        earlier_mask[recent_slots] = False
+        recent = context[recent_slots]
+        earlier = context[earlier_mask]
 
-        if cross_similarities:
-            avg_cross = sum(cross_similarities) / len(cross_similarities)
-            return avg_cross < threshold
+        if len(earlier) == 0:
+            # Compare within recent only (distinct pairs above the diagonal)
+            sims = recent @ recent.T
+            return float(sims[np.triu_indices(len(recent), k=1)].mean()) < threshold
 
-        return False
+        # Compare recent to earlier
+        return float((recent @ earlier.T).mean()) < threshold
 
     def get_embedding_stats(self) -> dict:
         """Get statistics about the embedding system."""
@@ -642,7 +1149,7 @@ class MemorySystem:
             "dimension": self.dimension,
             "total_semantic_memories": total_memories,
             "index_size": len(self.semantic_id_map),
-            "context_embeddings_tracked": len(self._context_embeddings),
+            "context_embeddings_tracked": min(self._ctx_count, self._max_context_embeddings),
             "faiss_available": FAISS_AVAILABLE,
         }
 
@@ -665,23 +1172,50 @@ class MemorySystem:
         """
         cursor = self.db.cursor()
         cursor.execute(
-            """
-            INSERT INTO uncertainty_log
-            (timestamp, user_message, parsed_intent, confidence_score, context, signals)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (
-                time.time(),
-                user_message,
-                parsed_intent,
-                confidence_score,
-                context[:2000] if context else "",  # Limit context size
-                json.dumps(signals),
+            self._INSERT_UNCERTAINTY_SQL,
+            self._uncertainty_row(
+                time.time(), user_message, parsed_intent, confidence_score, context, signals
             ),
         )
-        self.db.commit()
+        self._maybe_commit()
         return cursor.lastrowid
 
+    def log_uncertainty_batch(
+        self, entries: list[tuple[str, str, float, str, dict[str, float]]]
+    ) -> int:
+        """
+        Log several uncertainty events in one transaction.
+        Each entry is (user_message, parsed_intent, confidence_score, context, signals).
+        Returns the number of entries written.
+        """
+        if not entries:
+            return 0
+        now = time.time()  # One timestamp for the whole batch, like the other bulk writers
+        self.db.executemany(
+            self._INSERT_UNCERTAINTY_SQL, [self._uncertainty_row(now, *entry) for entry in entries]
+        )
+        self.flush()
+        return len(entries)
+
+    @staticmethod
+    def _uncertainty_row(
+        timestamp: float,
+        user_message: str,
+        parsed_intent: str,
+        confidence_score: float,
+        context: str,
+        signals: dict[str, float],
+    ) -> tuple:
+        """Build an uncertainty_log row in _INSERT_UNCERTAINTY_SQL column order."""
+        return (
+            timestamp,
+            user_message,
+            parsed_intent,
+            confidence_score,
+            context or "",
+            _dumps(signals),
+        )
+
     def get_uncertainty_logs(
         self,
         limit: int = 500,
@@ -693,26 +1227,12 @@ class MemorySystem:
         Retrieve uncertainty logs for pattern analysis.
         Used by the harvest cycle to identify linguistic patterns.
         """
-        cursor = self.db.cursor()
-
-        query = """
-            SELECT id, timestamp, user_message, parsed_intent,
-                   confidence_score, context, signals, resolved, resolution_pattern
-            FROM uncertainty_log
-            WHERE confidence_score >= ? AND confidence_score <= ?
-        """
-        params = [min_confidence, max_confidence]
-
-        if unresolved_only:
-            query += " AND resolved = 0"
-
-        query += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
-
-        cursor.execute(query, params)
+        query = self._SELECT_UNCERTAINTY_SQL_BY_FILTER[bool(unresolved_only)]
+        with self._read_conn() as conn:
+            rows = conn.execute(query, (min_confidence, max_confidence, limit)).fetchall()
 
         results = []
-        for row in cursor.fetchall():
+        for row in rows:
             results.append(
                 {
                     "id": row[0],
@@ -743,28 +1263,27 @@ class MemorySystem:
             """,
             (resolution_pattern, log_id),
         )
-        self.db.commit()
+        self._maybe_commit()
 
     def get_uncertainty_stats(self) -> dict:
         """Get statistics about uncertainty logs for monitoring."""
-        cursor = self.db.cursor()
-
-        # Total count
-        cursor.execute("SELECT COUNT(*) FROM uncertainty_log")
-        total = cursor.fetchone()[0]
-
-        # Unresolved count
-        cursor.execute("SELECT COUNT(*) FROM uncertainty_log WHERE resolved = 0")
-        unresolved = cursor.fetchone()[0]
-
-        # Average confidence
-        cursor.execute("SELECT AVG(confidence_score) FROM uncertainty_log")
-        avg_confidence = cursor.fetchone()[0] or 0.0
-
-        # Recent count (last 24 hours)
+        # One pass with conditional aggregates instead of four separate scans
         day_ago = time.time() - 86400
-        cursor.execute("SELECT COUNT(*) FROM uncertainty_log WHERE timestamp > ?", (day_ago,))
-        recent = cursor.fetchone()[0]
+        with self._read_conn() as conn:
+            total, unresolved, avg_confidence, recent = conn.execute(
+                """
+                SELECT COUNT(*),
+                       SUM(CASE WHEN resolved = 0 THEN 1 ELSE 0 END),
+                       AVG(confidence_score),
+                       SUM(CASE WHEN timestamp > ? THEN 1 ELSE 0 END)
+                FROM uncertainty_log
+                """,
+                (day_ago,),
+            ).fetchone()
+        # SUM and AVG are NULL over an empty table
+        unresolved = unresolved or 0
+        avg_confidence = avg_confidence or 0.0
+        recent = recent or 0
 
         return {
             "total_entries": total,
@@ -776,15 +1295,31 @@ class MemorySystem:
         }
 
     async def save_state(self):
-        """Save all state to disk."""
-        if self.db:
-            self.db.commit()
-
-        if FAISS_AVAILABLE and self.vector_store:
-            faiss.write_index(self.vector_store, str(self.embeddings_path / "index.faiss"))
-
-        # Save semantic ID mapping
-        if self.semantic_id_map:
-            id_map_path = self.embeddings_path / "id_map.json"
-            with open(id_map_path, "w") as f:
-                json.dump(self.semantic_id_map, f)
+        """
+        Save all state to disk. Pending rows are committed on the calling
+        thread; the index files are written from a worker thread so a large
+        checkpoint does not stall the event loop.
+        """
+        self.flush()
+
+        # The index and ID map only change together, when vectors are added
+        if self._save_lock is None:
+            self._save_lock = asyncio.Lock()
+        async with self._save_lock:
+            if not self._index_dirty:
+                return
+            # Snapshot on the loop thread so adds during the write cannot race it
+            index_bytes = None
+            if FAISS_AVAILABLE and self.vector_store:
+                index_bytes = faiss.serialize_index(self.vector_store)
+            id_map = np.frombuffer(self.semantic_id_map, dtype=np.int64).copy()
+            self._index_dirty = False
+            await asyncio.to_thread(self._write_index_files, index_bytes, id_map)
+
+    def _write_index_files(self, index_bytes: Optional[np.ndarray], id_map: np.ndarray):
+        """Write a serialized FAISS index and the semantic ID map."""
+        if index_bytes is not None:
+            # One sequential write of the serialized index
+            index_bytes.tofile(self.embeddings_path / "index.faiss")
+        if len(id_map):
+            np.save(self.embeddings_path / "id_map.npy", id_map)
@@ -9,6 +9,10 @@ Key Phase 2 changes:
 
 import asyncio
 import json
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 from typing import Optional
 
@@ -25,10 +29,45 @@ from psychological.temporal_purpose import TemporalPurposeEngine
 from utils.emotion_regulator import EmotionRegulator
 from utils.metrics import MetricsTracker
 
+# Optional: orjson for faster JSON parsing (errors subclass json.JSONDecodeError)
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# libyaml's C parser when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# /tool command parsing: name(args), key=value arguments, numeric literals
+_TOOL_CALL_RE = re.compile(r"(\w+)\((.*)\)", re.DOTALL)
+_TOOL_ARG_RE = re.compile(r"(\w+)\s*=\s*(?:'([^']*)'|\"([^\"]*)\"|(\S+))")
+_FLOAT_RE = re.compile(r"^[\d.]+$")
+
+# Prompt-line prefixes for the known roles; others fall back to str.title()
+_ROLE_PREFIX = {"user": "User: ", "assistant": "Assistant: ", "system": "System: "}
+
+# Appended to the system prompt on turns that always refine, so the draft and
+# its critique come back from one call
+_INLINE_REFINE_PROMPT = (
+    "Before answering, write a draft reply, then review it for alignment with the "
+    "user's message and your current emotional state. Rewrite it only if meaningful "
+    "improvements are needed.\n"
+    'Output JSON: {"draft": str, "score": float, "final_response": str}'
+)
+
 
 class SynthOrchestrator:
     """Main orchestrator integrating all SMS modules."""
 
+    # In-memory conversation window; every turn is also persisted by MemorySystem
+    MAX_CONTEXT_MESSAGES = 256
+
+    # Background housekeeping cadence and how long shutdown waits for it
+    CONSOLIDATION_INTERVAL = 300.0  # seconds
+    SHUTDOWN_TIMEOUT = 5.0  # seconds
+
     def __init__(self, config_path: str = "config"):
         self.config_path = Path(config_path)
         self.state_path = Path("state")
@@ -52,25 +91,76 @@ class SynthOrchestrator:
         self.personality_config: dict = {}
 
         # State
-        self.context = []
+        # (role, content) tuples: far smaller than a two-key dict per message
+        self.context: deque[tuple[str, str]] = deque(maxlen=self.MAX_CONTEXT_MESSAGES)
+        # The same messages pre-formatted as prompt lines, appended alongside context
+        self._context_lines: deque[str] = deque(maxlen=self.MAX_CONTEXT_MESSAGES)
+        # (window, text) of the last _format_context call; cleared on append
+        self._ctx_cache: Optional[tuple[int, str]] = None
+        # (narrative, text) of the stable system-prompt half; rebuilt when the narrative moves
+        self._static_prompt_cache: Optional[tuple[str, str]] = None
         self.turn_count = 0
         self.running = False
         self._background_tasks: list[asyncio.Task] = []
+        # Wakes the consolidation loop early (/consolidate, shutdown); created in
+        # initialize() so it belongs to the running loop
+        self._consolidate_event: Optional[asyncio.Event] = None
+        # Dreaming for the next turn runs while the user is composing it
+        self._dream_task: Optional[asyncio.Task] = None
+        # Blocking input() gets its own thread so to_thread work cannot delay the prompt
+        self._stdin_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stdin")
+
+        # Slash-command dispatch: exact matches first, then prefixes (longest first)
+        self._exact_commands = {
+            "/state": self._cmd_state,
+            "/reflect": self._cmd_reflect,
+            "/dream": self._cmd_dream,
+            "/purpose": self._cmd_purpose,
+            "/consolidate": self._cmd_consolidate,
+            "/reset": self._cmd_reset,
+            "/tools": self._cmd_tools,
+            "/quit": self._cmd_quit,
+        }
+        self._prefix_commands = [("/tool ", self._execute_tool)]
 
     def _load_personality_config(self) -> dict:
-        """Load personality configuration from YAML."""
+        """
+        Load personality configuration from YAML.
+        The parsed result is cached as JSON in the state directory and reused
+        until personality.yaml changes, so startup skips the YAML parser.
+        """
         config_file = self.config_path / "personality.yaml"
-        if config_file.exists():
-            try:
-                with open(config_file) as f:
-                    return yaml.safe_load(f) or {}
-            except Exception as e:
-                print(f"Warning: Failed to load personality.yaml: {e}")
-        return {}
+        if not config_file.exists():
+            return {}
+
+        cache_file = self.state_path / "personality.cache.json"
+        source = {"path": str(config_file.resolve()), "mtime_ns": config_file.stat().st_mtime_ns}
+        try:
+            cached = _json_loads(cache_file.read_bytes())
+            if cached.get("source") == source:
+                return cached["config"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass  # Missing or stale cache: parse the YAML below
+
+        try:
+            with open(config_file) as f:
+                config = yaml.load(f, Loader=_YAML_LOADER) or {}
+        except Exception as e:
+            print(f"Warning: Failed to load personality.yaml: {e}")
+            return {}
+
+        try:
+            tmp_file = cache_file.with_suffix(".tmp")
+            tmp_file.write_text(json.dumps({"source": source, "config": config}))
+            tmp_file.replace(cache_file)
+        except (OSError, TypeError, ValueError):
+            pass  # Unwritable state dir or non-JSON YAML values: just skip caching
+        return config
 
     async def initialize(self):
         """Load configuration and initialize all modules."""
-        self.personality_config = self._load_personality_config()
+        # File reads and YAML parsing happen off the event loop
+        self.personality_config = await asyncio.to_thread(self._load_personality_config)
 
         # Initialize core
         self.llm = LLMWrapper()
@@ -100,6 +190,7 @@ class SynthOrchestrator:
         )
 
         # Start background tasks
+        self._consolidate_event = asyncio.Event()
         self._background_tasks = [
             asyncio.create_task(self._background_consolidation()),
         ]
@@ -108,29 +199,28 @@ class SynthOrchestrator:
     # System Prompt Builder — the primary mechanism for psychology → output
     # =========================================================================
 
-    def _build_system_prompt(self) -> str:
+    def _build_system_prompt(self) -> tuple[str, str]:
         """
         Compose system prompt from all psychological module states.
         This is how emotional state, dreams, reflections, and identity
         actually reach the LLM output.
+
+        Returns (stable, volatile): personality and narrative rarely change, so
+        they form a prefix the provider can cache; per-turn state follows it.
         """
         sections = []
 
-        # 1. Base personality
-        sections.append(self._get_personality_prompt())
+        # 1-2. Base personality and current narrative / identity
+        static_prompt = self._static_system_prompt()
 
-        # 2. Emotional state influence (PAD model → tone/verbosity/assertiveness)
+        # 3. Emotional state influence (PAD model → tone/verbosity/assertiveness)
         emotion_modifier = self.emotion.get_system_prompt_modifier()
         if emotion_modifier:
             sections.append(emotion_modifier)
 
-        # 3. Current narrative / identity
-        narrative = self.temporal.current_narrative_summary()
-        sections.append(f"Your current self-understanding: {narrative}")
-
         # 4. Dream predictions context — what you anticipated
-        if self.dreaming.dream_buffer:
-            top_dream = max(self.dreaming.dream_buffer, key=lambda d: d["prob"])
+        top_dream = self.dreaming.top_dream
+        if top_dream is not None:
             sections.append(
                 f"You anticipated the user might say something like: "
                 f"'{top_dream['text'][:100]}'. Adapt if reality differs."
@@ -156,7 +246,18 @@ class SynthOrchestrator:
         elif recent_uncertainty < 0.3:
             sections.append("You are confident in recent interactions. " "Be direct and helpful.")
 
-        return "\n\n".join(sections)
+        return static_prompt, "\n\n".join(sections)
+
+    def _static_system_prompt(self) -> str:
+        """Personality and narrative sections, rebuilt only when the narrative changes."""
+        narrative = self.temporal.current_narrative_summary()
+        cached = self._static_prompt_cache
+        if cached is not None and cached[0] == narrative:
+            return cached[1]
+
+        text = f"{self._get_personality_prompt()}\n\nYour current self-understanding: {narrative}"
+        self._static_prompt_cache = (narrative, text)
+        return text
 
     def _get_personality_prompt(self) -> str:
         """Get base personality prompt from config."""
@@ -202,7 +303,8 @@ class SynthOrchestrator:
         """Process a single conversation turn with all modules."""
         self.turn_count += 1
 
-        # 1. Resolve previous dreams
+        # 1. Resolve previous dreams (waiting for them if still being generated)
+        await self._await_dreams()
         if self.dreaming.dream_buffer:
             reward, alignment = self.dreaming.resolve_dreams(user_input)
             self.metrics.log_dream_alignment(alignment)
@@ -211,7 +313,7 @@ class SynthOrchestrator:
                 self.assurance.vigilance_level = "HIGH"
 
         # 2. Update context
-        self.context.append({"role": "user", "content": user_input})
+        self._append_context("user", user_input)
         context_str = self._format_context()
 
         # 3. Build system prompt from all psychological state
@@ -222,9 +324,12 @@ class SynthOrchestrator:
         emotion_temp_delta = self.emotion.get_temperature_modifier()
         effective_temp = max(0.1, min(1.5, base_temp + emotion_temp_delta))
 
-        # 5. Generate draft response with psychological context
-        draft_response = await self.llm.generate(
-            context_str, temperature=effective_temp, system=system_prompt
+        # 5. Generate draft response with psychological context. Every third turn
+        # refines regardless of uncertainty, so those turns request the draft and
+        # its critique together
+        scheduled_refine = self.turn_count % 3 == 0
+        draft_response, refined_response = await self._generate_draft(
+            context_str, effective_temp, system_prompt, refine=scheduled_refine
         )
 
         # 6. Run Assurance cycle
@@ -232,19 +337,29 @@ class SynthOrchestrator:
             draft_response, context_str, {}, user_message=user_input
         )
 
-        # 7. Meta-cognitive refinement (if needed)
-        if uncertainty > 0.6 or self.turn_count % 3 == 0:
-            final_response = await self._metacognitive_refine(
-                draft_response, user_input, context_str
+        # Meta-reflection reads this turn's post-assurance emotion and metrics, then
+        # runs alongside refinement and is joined in step 8, when its result is needed
+        reflection_task = asyncio.create_task(
+            self.reflection.run_cycle(
+                context_str, self.emotion.current_state(), self._gather_metrics()
             )
-        else:
-            final_response = draft_response
-
-        # 8. Check for meta-reflection trigger
-        reflection_result = await self.reflection.run_cycle(
-            context_str, self.emotion.current_state(), self._gather_metrics()
         )
-
+        try:
+            # 7. Meta-cognitive refinement (if needed)
+            if refined_response is not None:
+                final_response = refined_response
+            elif uncertainty > 0.6 or scheduled_refine:
+                final_response = await self._metacognitive_refine(
+                    draft_response, user_input, context_str
+                )
+            else:
+                final_response = draft_response
+        except BaseException:
+            reflection_task.cancel()  # Don't leave it running if the turn fails
+            raise
+
+        # 8. Flag low coherence from the meta-reflection started after step 6
+        reflection_result = await reflection_task
         if reflection_result and reflection_result.get("coherence_score", 1.0) < 0.6:
             final_response += "\n\n(Taking a moment to recalibrate...)"
 
@@ -258,11 +373,14 @@ class SynthOrchestrator:
         print(f"\n Synth: {final_response}\n")
 
         # 12. Update context and state
-        self.context.append({"role": "assistant", "content": final_response})
+        self._append_context("assistant", final_response)
         self.memory.store_turn(user_input, final_response)
 
-        # 13. Dream ahead for next turn
-        await self.dreaming.dream_next_turn(self._format_context())
+        # 13. Dream ahead for next turn in the background; the LLM call overlaps
+        # with metrics, output and the user's next input instead of delaying them
+        self._dream_task = asyncio.create_task(
+            self.dreaming.dream_next_turn(self._format_context())
+        )
 
         # 14. Update metrics
         self.metrics.update_turn_metrics(
@@ -271,6 +389,49 @@ class SynthOrchestrator:
             flow_state=calib_state["state"],
         )
 
+    async def _await_dreams(self):
+        """
+        Wait for the previous turn's background dreaming to finish.
+        A failed dream is logged rather than failing the turn that awaits it.
+        """
+        task, self._dream_task = self._dream_task, None
+        if task is None:
+            return
+        (result,) = await asyncio.gather(task, return_exceptions=True)
+        if isinstance(result, Exception):  # A cancelled dream is not a failure
+            print(f"⚠️  Background dreaming failed: {result!r}")
+
+    async def _generate_draft(
+        self, context_str: str, temperature: float, system_prompt: tuple[str, str], refine: bool
+    ) -> tuple[str, Optional[str]]:
+        """
+        Generate the draft response.
+        With refine set, one JSON call also returns the self-critiqued reply;
+        returns (draft, refined), where refined is None if not requested or unparseable.
+        An unparseable reply is used as the draft itself rather than generating again.
+        """
+        if refine:
+            stable, volatile = system_prompt
+            raw = await self.llm.generate(
+                context_str,
+                temperature=temperature,
+                system=(stable, f"{volatile}\n\n{_INLINE_REFINE_PROMPT}".lstrip()),
+                json_mode=True,
+            )
+            try:
+                result = _json_loads(raw)
+                draft = result["draft"]
+                refined = result.get("final_response", draft)
+                if isinstance(draft, str) and isinstance(refined, str):
+                    return draft, refined
+            except (json.JSONDecodeError, KeyError, TypeError):
+                pass
+            # Keep the raw reply as the draft; step 7 refines it separately
+            return raw, None
+
+        draft = await self.llm.generate(context_str, temperature=temperature, system=system_prompt)
+        return draft, None
+
     async def _metacognitive_refine(self, draft: str, user_input: str, context: str) -> str:
         """Internal monologue — critique and refine the draft."""
         current_mood = self.emotion.get_current_state()
@@ -288,9 +449,9 @@ If meaningful improvements needed, rewrite. Otherwise return original.
 Output JSON: {{"score": float, "internal_thought": str, "final_response": str}}
 """
 
-        critique_raw = await self.llm.generate(prompt, temperature=0.1)
+        critique_raw = await self.llm.generate(prompt, temperature=0.1, json_mode=True)
         try:
-            critique = json.loads(critique_raw)
+            critique = _json_loads(critique_raw)
             return critique.get("final_response", draft)
         except (json.JSONDecodeError, KeyError):
             return draft
@@ -301,12 +462,25 @@ Output JSON: {{"score": float, "internal_thought": str, "final_response": str}}
 
     async def _get_input(self) -> str:
         """Get user input asynchronously."""
-        return await asyncio.to_thread(input, "You: ")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._stdin_pool, input, "You: ")
+
+    def _append_context(self, role: str, content: str):
+        """Record a message, formatting its prompt line once."""
+        self.context.append((role, content))
+        prefix = _ROLE_PREFIX.get(role) or f"{role.title()}: "
+        self._context_lines.append(prefix + content)
+        self._ctx_cache = None
 
     def _format_context(self, window: int = 20) -> str:
-        """Format recent context for prompts."""
-        recent = self.context[-window:] if len(self.context) > window else self.context
-        return "\n".join([f"{msg['role'].title()}: {msg['content']}" for msg in recent])
+        """Format recent context for prompts (reused until a message is appended)."""
+        cached = self._ctx_cache
+        if cached and cached[0] == window:
+            return cached[1]
+        lines = self._context_lines
+        text = "\n".join(islice(lines, max(len(lines) - window, 0), None))
+        self._ctx_cache = (window, text)
+        return text
 
     def _gather_metrics(self) -> dict:
         """Gather current performance metrics."""
@@ -324,33 +498,54 @@ Output JSON: {{"score": float, "internal_thought": str, "final_response": str}}
         """Handle special commands."""
         cmd = command.lower().strip()
 
-        if cmd == "/state":
-            self._print_state()
-        elif cmd == "/reflect":
-            result = await self.reflection.run_cycle(
-                self._format_context(), self.emotion.current_state(), self._gather_metrics()
-            )
-            print(f"\nReflection: {json.dumps(result, indent=2)}\n")
-        elif cmd == "/dream":
-            print(f"\nDream Buffer ({len(self.dreaming.dream_buffer)} dreams):")
-            for i, dream in enumerate(self.dreaming.dream_buffer[:5], 1):
-                print(f"  {i}. {dream['text'][:80]}... (p={dream['prob']:.2f})")
-            print()
-        elif cmd == "/purpose":
-            narrative = self.temporal.current_narrative_summary()
-            print(f"\nCurrent Narrative:\n  {narrative}\n")
-        elif cmd == "/reset":
-            self.context = []
-            self.turn_count = 0
-            print("\nSession reset (identity preserved)\n")
-        elif cmd == "/tools":
-            self._print_tools()
-        elif cmd.startswith("/tool "):
-            await self._execute_tool(command[6:].strip())
-        elif cmd == "/quit":
-            self.running = False
-        else:
-            print(f"\nUnknown command: {command}\n")
+        handler = self._exact_commands.get(cmd)
+        if handler is not None:
+            await handler()
+            return
+        for prefix, handler in self._prefix_commands:
+            if cmd.startswith(prefix):
+                # Arguments keep their original case
+                await handler(command.strip()[len(prefix) :].strip())
+                return
+        print(f"\nUnknown command: {command}\n")
+
+    async def _cmd_state(self):
+        self._print_state()
+
+    async def _cmd_reflect(self):
+        result = await self.reflection.run_cycle(
+            self._format_context(), self.emotion.current_state(), self._gather_metrics()
+        )
+        print(f"\nReflection: {json.dumps(result, indent=2)}\n")
+
+    async def _cmd_dream(self):
+        print(f"\nDream Buffer ({len(self.dreaming.dream_buffer)} dreams):")
+        for i, dream in enumerate(self.dreaming.dream_buffer[:5], 1):
+            print(f"  {i}. {dream['text'][:80]}... (p={dream['prob']:.2f})")
+        print()
+
+    async def _cmd_purpose(self):
+        narrative = self.temporal.current_narrative_summary()
+        print(f"\nCurrent Narrative:\n  {narrative}\n")
+
+    async def _cmd_consolidate(self):
+        if self._consolidate_event is not None:
+            self._consolidate_event.set()
+        print("\nConsolidation triggered\n")
+
+    async def _cmd_reset(self):
+        self.context.clear()
+        self._context_lines.clear()
+        self._ctx_cache = None
+        self._static_prompt_cache = None
+        self.turn_count = 0
+        print("\nSession reset (identity preserved)\n")
+
+    async def _cmd_tools(self):
+        self._print_tools()
+
+    async def _cmd_quit(self):
+        self.running = False
 
     def _print_tools(self):
         """Display available tools."""
@@ -371,9 +566,7 @@ Output JSON: {{"score": float, "internal_thought": str, "final_response": str}}
 
     async def _execute_tool(self, tool_call: str):
         """Execute a tool from command line."""
-        import re
-
-        match = re.match(r"(\w+)\((.*)\)", tool_call, re.DOTALL)
+        match = _TOOL_CALL_RE.match(tool_call)
         if not match:
             parts = tool_call.split(maxsplit=1)
             if len(parts) == 2:
@@ -395,7 +588,7 @@ Output JSON: {{"score": float, "internal_thought": str, "final_response": str}}
 
         kwargs = {}
         if args_str.strip():
-            for arg_match in re.finditer(r"(\w+)\s*=\s*(?:'([^']*)'|\"([^\"]*)\"|(\S+))", args_str):
+            for arg_match in _TOOL_ARG_RE.finditer(args_str):
                 key = arg_match.group(1)
                 value = arg_match.group(2) or arg_match.group(3) or arg_match.group(4)
                 if value.lower() == "true":
@@ -404,7 +597,7 @@ Output JSON: {{"score": float, "internal_thought": str, "final_response": str}}
                     value = False
                 elif value.isdigit():
                     value = int(value)
-                elif re.match(r"^[\d.]+$", value):
+                elif _FLOAT_RE.match(value):
                     try:
                         value = float(value)
                     except ValueError:
@@ -469,13 +662,23 @@ Output JSON: {{"score": float, "internal_thought": str, "final_response": str}}
         - Save Mandelbrot corpus
         - Update temporal narrative based on accumulated data
         - Apply emotional decay
+        Runs every CONSOLIDATION_INTERVAL, or early when _consolidate_event is set.
         """
         while self.running:
-            await asyncio.sleep(300)  # Every 5 minutes
+            try:
+                await asyncio.wait_for(
+                    self._consolidate_event.wait(), timeout=self.CONSOLIDATION_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._consolidate_event.clear()
+            if not self.running:
+                break  # Woken by shutdown, which saves state itself
 
             # 1. Save Mandelbrot word frequency corpus
-            if hasattr(self.assurance, "save_mandelbrot_corpus"):
-                self.assurance.save_mandelbrot_corpus()
+            # Shielded so a cancelled loop cannot abandon the file mid-write
+            if hasattr(self.assurance, "save_mandelbrot_corpus_async"):
+                await asyncio.shield(self.assurance.save_mandelbrot_corpus_async())
 
             # 2. Apply emotional decay toward baseline
             self.emotion.apply_decay()
@@ -487,22 +690,35 @@ Output JSON: {{"score": float, "internal_thought": str, "final_response": str}}
                 )
 
     async def shutdown(self):
-        """Graceful shutdown - cancel background tasks and save state."""
+        """Graceful shutdown - stop background tasks and save state."""
         self.running = False
 
+        # Wake the consolidation loop so it exits between passes rather than
+        # being cancelled mid-save; wait_for cancels anything still running
+        if self._consolidate_event is not None:
+            self._consolidate_event.set()
         for task in self._background_tasks:
-            if not task.done():
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    pass
+            try:
+                await asyncio.wait_for(task, timeout=self.SHUTDOWN_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
 
         self._background_tasks.clear()
 
+        if self._dream_task is not None and not self._dream_task.done():
+            self._dream_task.cancel()
+            try:
+                await self._dream_task
+            except asyncio.CancelledError:
+                pass
+        self._dream_task = None
+        # A pending input() cannot be interrupted; don't wait for it
+        self._stdin_pool.shutdown(wait=False)
+
         # Save Mandelbrot corpus on exit
-        if hasattr(self.assurance, "save_mandelbrot_corpus"):
-            self.assurance.save_mandelbrot_corpus()
+        if hasattr(self.assurance, "save_mandelbrot_corpus_async"):
+            await self.assurance.save_mandelbrot_corpus_async()
 
         await self.memory.save_state()
+        await self.llm.aclose()
         print("State saved")
@@ -7,12 +7,91 @@ Available Tools:
 - json_parse: Parse and query JSON data
 """
 
+import ast
 import asyncio
+import functools
 import json
+import math
 import multiprocessing
+import operator
 from pathlib import Path
 from typing import Any, Optional
 
+# Calculator grammar: the only operators, functions and names expressions may use
+_CALC_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+_CALC_FUNCTIONS = {
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "sum": sum,
+    "pow": pow,
+    "sqrt": math.sqrt,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "log": math.log,
+    "log10": math.log10,
+    "exp": math.exp,
+    "floor": math.floor,
+    "ceil": math.ceil,
+}
+
+_CALC_CONSTANTS = {
+    "pi": math.pi,
+    "e": math.e,
+}
+
+
+def _calc_node(node):
+    """Recursively evaluate AST nodes safely."""
+    if isinstance(node, ast.Expression):
+        return _calc_node(node.body)
+    elif isinstance(node, ast.Constant):
+        if isinstance(node.value, (int, float)):
+            return node.value
+        raise ValueError(f"Invalid constant: {node.value}")
+    elif isinstance(node, ast.Name):
+        if node.id in _CALC_CONSTANTS:
+            return _CALC_CONSTANTS[node.id]
+        raise ValueError(f"Unknown variable: {node.id}")
+    elif isinstance(node, ast.BinOp):
+        op = _CALC_OPERATORS.get(type(node.op))
+        if op is None:
+            raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
+        return op(_calc_node(node.left), _calc_node(node.right))
+    elif isinstance(node, ast.UnaryOp):
+        op = _CALC_OPERATORS.get(type(node.op))
+        if op is None:
+            raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
+        return op(_calc_node(node.operand))
+    elif isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name):
+            raise ValueError("Only simple function calls allowed")
+        func = _CALC_FUNCTIONS.get(node.func.id)
+        if func is None:
+            raise ValueError(f"Unknown function: {node.func.id}")
+        return func(*[_calc_node(arg) for arg in node.args])
+    else:
+        raise ValueError(f"Unsupported expression type: {type(node).__name__}")
+
+
+@functools.lru_cache(maxsize=256)
+def _calc_evaluate(expression: str):
+    """Parse and evaluate an expression; results are pure, so repeats are memoized."""
+    return _calc_node(ast.parse(expression, mode="eval"))
+
 
 class ToolManager:
     """
@@ -70,90 +149,8 @@ class ToolManager:
         Supports: +, -, *, /, **, %, parentheses, and math functions.
         Uses AST parsing instead of eval() for security.
         """
-        import ast
-        import math
-        import operator
-
-        # Allowed operators
-        operators = {
-            ast.Add: operator.add,
-            ast.Sub: operator.sub,
-            ast.Mult: operator.mul,
-            ast.Div: operator.truediv,
-            ast.FloorDiv: operator.floordiv,
-            ast.Mod: operator.mod,
-            ast.Pow: operator.pow,
-            ast.USub: operator.neg,
-            ast.UAdd: operator.pos,
-        }
-
-        # Allowed functions
-        functions = {
-            "abs": abs,
-            "round": round,
-            "min": min,
-            "max": max,
-            "sum": sum,
-            "pow": pow,
-            "sqrt": math.sqrt,
-            "sin": math.sin,
-            "cos": math.cos,
-            "tan": math.tan,
-            "log": math.log,
-            "log10": math.log10,
-            "exp": math.exp,
-            "floor": math.floor,
-            "ceil": math.ceil,
-        }
-
-        # Allowed constants
-        constants = {
-            "pi": math.pi,
-            "e": math.e,
-        }
-
-        def safe_eval(node):
-            """Recursively evaluate AST nodes safely."""
-            if isinstance(node, ast.Expression):
-                return safe_eval(node.body)
-            elif isinstance(node, ast.Constant):  # Python 3.8+
-                if isinstance(node.value, (int, float)):
-                    return node.value
-                raise ValueError(f"Invalid constant: {node.value}")
-            elif isinstance(node, ast.Num):  # Python 3.7 compatibility
-                return node.n
-            elif isinstance(node, ast.Name):
-                if node.id in constants:
-                    return constants[node.id]
-                raise ValueError(f"Unknown variable: {node.id}")
-            elif isinstance(node, ast.BinOp):
-                op_type = type(node.op)
-                if op_type not in operators:
-                    raise ValueError(f"Unsupported operator: {op_type.__name__}")
-                left = safe_eval(node.left)
-                right = safe_eval(node.right)
-                return operators[op_type](left, right)
-            elif isinstance(node, ast.UnaryOp):
-                op_type = type(node.op)
-                if op_type not in operators:
-                    raise ValueError(f"Unsupported operator: {op_type.__name__}")
-                operand = safe_eval(node.operand)
-                return operators[op_type](operand)
-            elif isinstance(node, ast.Call):
-                if not isinstance(node.func, ast.Name):
-                    raise ValueError("Only simple function calls allowed")
-                func_name = node.func.id
-                if func_name not in functions:
-                    raise ValueError(f"Unknown function: {func_name}")
-                args = [safe_eval(arg) for arg in node.args]
-                return functions[func_name](*args)
-            else:
-                raise ValueError(f"Unsupported expression type: {type(node).__name__}")
-
         try:
-            # Parse expression into AST
-            tree = ast.parse(expression, mode="eval")
-            result = safe_eval(tree)
+            result = _calc_evaluate(expression)
             return {"success": True, "result": result, "expression": expression}
         except SyntaxError as e:
             return {"success": False, "error": f"Syntax error: {e}", "expression": expression}
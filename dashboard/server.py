@@ -25,6 +25,14 @@ except ImportError as err:
 from core.orchestrator import SynthOrchestrator
 from utils.auth import AuthManager
 
+# Optional: uvloop for lower task-scheduling overhead (Linux/macOS)
+try:
+    import uvloop
+
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
 
 class DashboardServer:
     """WebSocket server for streaming internal state to dashboard."""
@@ -197,7 +205,7 @@ class DashboardServer:
 
             await self.orchestrator._process_turn(message)
 
-            response = self.orchestrator.context[-1]["content"]
+            _, response = self.orchestrator.context[-1]
             emotion_state = self.orchestrator.emotion.current_state()
 
             await self.broadcast_state()
@@ -657,6 +665,9 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if UVLOOP_AVAILABLE:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print("\nShutting down dashboard server...")
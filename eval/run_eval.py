@@ -192,7 +192,7 @@ class EvalMockLLM:
 
         hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
         rng = np.random.default_rng(hash_val % (2**32))
-        return rng.standard_normal(384)
+        return rng.standard_normal(384, dtype=np.float32)
 
 
 class EvalMockMemory:
@@ -210,7 +210,7 @@ class EvalMockMemory:
 
         hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
         rng = np.random.default_rng(hash_val % (2**32))
-        return rng.standard_normal(384)
+        return rng.standard_normal(384, dtype=np.float32)
 
     def store_turn(self, user_input, response):
         self.current_turn += 1
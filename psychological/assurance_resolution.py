@@ -444,6 +444,11 @@ class AssuranceResolutionModule:
         if self.mandelbrot:
             self.mandelbrot.save_corpus()
 
+    async def save_mandelbrot_corpus_async(self):
+        """Save the Mandelbrot corpus, writing the file off the event loop."""
+        if self.mandelbrot:
+            await self.mandelbrot.save_corpus_async()
+
     def explain_word_weight(self, word: str) -> dict:
         """Explain the Mandelbrot weight for a specific word."""
         if self.mandelbrot:
@@ -4,6 +4,7 @@ Anticipates probable next user inputs, rewards alignment with reality.
 """
 
 import json
+from typing import Optional
 
 import numpy as np
 
@@ -25,6 +26,7 @@ class PredictiveDreamingModule:
         self.emotion = emotion_regulator
         self.reward_weight = reward_weight
         self.dream_buffer = []
+        self.top_dream: Optional[dict] = None  # Most probable buffered dream
         self.alignment_history = []
 
     async def dream_next_turn(self, current_context: str, n_dreams: int = 5):
@@ -47,16 +49,17 @@ Keep probabilities normalized (sum ≈ 1.0).
             dreams_raw = await self.llm.generate(prompt, temperature=0.9, max_tokens=512)
             dreams = self._parse_dreams(dreams_raw, n_dreams)
 
-            for dream in dreams:
-                embedding = self.memory.embed(dream["text"])
-                self.dream_buffer.append(
-                    {
-                        "text": dream["text"],
-                        "prob": dream["probability"],
-                        "embedding": embedding,
-                        "rewarded": False,
-                    }
-                )
+            embeddings = self.memory.embed_batch([dream["text"] for dream in dreams])
+            for dream, embedding in zip(dreams, embeddings):
+                entry = {
+                    "text": dream["text"],
+                    "prob": dream["probability"],
+                    "embedding": embedding,
+                    "rewarded": False,
+                }
+                self.dream_buffer.append(entry)
+                if self.top_dream is None or entry["prob"] > self.top_dream["prob"]:
+                    self.top_dream = entry
         except Exception as e:
             print(f"⚠️  Dreaming failed: {e}")
 
@@ -132,6 +135,7 @@ Keep probabilities normalized (sum ≈ 1.0).
 
         # Clear buffer
         self.dream_buffer.clear()
+        self.top_dream = None
 
         return normalized_reward, best_similarity
 
@@ -63,7 +63,7 @@ class TemporalPurposeEngine:
         """Load or initialize self-schema vector."""
         stored = self.memory.retrieve_persistent("self_schema_embedding")
         if stored:
-            return np.array(stored)
+            return np.array(stored, dtype=np.float32)
         return None
 
     def update_metrics(self, session_summary: dict):
@@ -10,6 +10,14 @@ import sys
 from core.orchestrator import SynthOrchestrator
 from utils.logging import setup_logging
 
+# Optional: uvloop for lower task-scheduling overhead (Linux/macOS)
+try:
+    import uvloop
+
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
 
 def print_banner():
     """Display startup banner."""
@@ -30,6 +38,7 @@ def print_banner():
       /reflect         - Trigger meta-reflection
       /dream           - Show current dream buffer
       /purpose         - Display self-narrative
+      /consolidate     - Run background housekeeping now
       /tools           - List available tools
       /tool <name>     - Execute a tool (e.g., /tool calculator 2+2)
       /reset           - Clear session (keeps long-term identity)
@@ -79,4 +88,7 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if UVLOOP_AVAILABLE:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
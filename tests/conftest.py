@@ -97,6 +97,11 @@ class MockMemory:
         rng = np.random.default_rng(hash_val)
         return rng.standard_normal(384)
 
+    def embed_batch(self, texts):
+        import numpy as np
+
+        return np.array([self.embed(text) for text in texts]).reshape(len(texts), 384)
+
     def store_turn(self, user_input, response):
         self.current_turn += 1
         self.conversation_history.append({"user": user_input, "assistant": response})
@@ -64,6 +64,470 @@ class TestLLMWrapper:
             with pytest.raises(ValueError, match="No LLM provider configured"):
                 wrapper._detect_provider()
 
+    @pytest.mark.asyncio
+    async def test_ollama_client_pooled(self):
+        """Test Ollama uses one pooled client bound to the base URL."""
+        env = {"OLLAMA_MODEL": "llama3.2", "OLLAMA_BASE_URL": "http://ollama.test:11434"}
+        with patch.dict(os.environ, env, clear=True):
+            from core.llm_wrapper import LLMWrapper
+
+            wrapper = LLMWrapper()
+
+        assert str(wrapper.client.base_url) == "http://ollama.test:11434"
+        assert wrapper.client.timeout.read == 60.0
+
+        await wrapper.aclose()
+        assert wrapper.client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_ollama_generate_and_stream(self):
+        """Test Ollama buffered and streaming generation."""
+        import json
+
+        import httpx
+
+        def handler(request):
+            payload = json.loads(request.content)
+            if payload["stream"]:
+                lines = [
+                    {"response": "Hel", "done": False},
+                    {"response": "lo", "done": False},
+                    {"response": "", "done": True},
+                ]
+                return httpx.Response(200, text="\n".join(json.dumps(x) for x in lines))
+            return httpx.Response(200, json={"response": "Hello", "done": True})
+
+        wrapper = await self._ollama_wrapper(handler)
+
+        assert await wrapper._generate_ollama("Hi", 0.7, 10, None) == "Hello"
+        chunks = [chunk async for chunk in wrapper.generate_stream("Hi")]
+        assert chunks == ["Hel", "lo"]
+
+        await wrapper.aclose()
+
+    @pytest.mark.asyncio
+    async def test_ollama_micro_batching(self):
+        """Test requests queued within one window are all answered."""
+        import asyncio
+        import json
+
+        import httpx
+
+        def handler(request):
+            return httpx.Response(200, json={"response": json.loads(request.content)["prompt"]})
+
+        wrapper = await self._ollama_wrapper(handler)
+
+        prompts = [f"prompt {i}" for i in range(wrapper.max_batch + 3)]
+        results = await asyncio.gather(*(wrapper.generate(p) for p in prompts))
+
+        assert results == prompts
+        await wrapper.aclose()
+
+    def test_generate_binds_provider_method(self):
+        """Test generate() calls straight into the provider when caching is off."""
+        with patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test-key"}, clear=True):
+            from core.llm_wrapper import LLMWrapper
+
+            wrapper = LLMWrapper()
+
+        assert wrapper._generate_cached == wrapper._generate_anthropic
+        # asyncio primitives are created lazily inside the running loop
+        assert wrapper._inflight_limit is None
+
+    @pytest.mark.asyncio
+    async def test_anthropic_uses_async_client(self):
+        """Test Anthropic generation awaits the native async client."""
+        from types import SimpleNamespace
+
+        import anthropic
+
+        from core.llm_wrapper import LLMWrapper
+
+        with patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test-key"}, clear=True):
+            wrapper = LLMWrapper()
+        assert isinstance(wrapper.client, anthropic.AsyncAnthropic)
+        await wrapper.client.close()
+
+        async def create(**kwargs):
+            return SimpleNamespace(content=[SimpleNamespace(text=kwargs["system"])])
+
+        wrapper.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+        assert await wrapper._generate_anthropic("Hi", 0.7, 10, "sys") == "sys"
+
+    @pytest.mark.asyncio
+    async def test_split_system_prompt_marks_cache_breakpoint(self):
+        """Test a (stable, volatile) system prompt caches only the stable half."""
+        from types import SimpleNamespace
+
+        from core.llm_wrapper import LLMWrapper, _system_text
+
+        with patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test-key"}, clear=True):
+            wrapper = LLMWrapper()
+        await wrapper.client.close()
+
+        sent = {}
+
+        async def create(**kwargs):
+            sent.update(kwargs)
+            return SimpleNamespace(content=[SimpleNamespace(text="ok")])
+
+        wrapper.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+        assert await wrapper.generate("Hi", system=("persona", "mood")) == "ok"
+
+        assert sent["system"] == [
+            {"type": "text", "text": "persona", "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": "mood"},
+        ]
+        assert _system_text(("persona", "mood")) == "persona\n\nmood"
+        assert _system_text(("persona", "")) == "persona"
+
+    @pytest.mark.asyncio
+    async def test_json_mode_requests_structured_output(self):
+        """Test json_mode maps onto each provider's structured-output option."""
+        import json
+        from types import SimpleNamespace
+
+        import httpx
+
+        from core.llm_wrapper import LLMWrapper
+
+        with patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test-key"}, clear=True):
+            wrapper = LLMWrapper()
+        await wrapper.client.close()
+
+        async def create(**kwargs):
+            assert kwargs["messages"][-1] == {"role": "assistant", "content": "{"}
+            return SimpleNamespace(content=[SimpleNamespace(text='"score": 1}')])
+
+        wrapper.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+        assert await wrapper.generate("Hi", json_mode=True) == '{"score": 1}'
+
+        def handler(request):
+            return httpx.Response(200, json={"response": json.loads(request.content)["format"]})
+
+        wrapper = await self._ollama_wrapper(handler)
+
+        assert await wrapper.generate("Hi", json_mode=True) == "json"
+        await wrapper.aclose()
+
+    @pytest.mark.asyncio
+    async def test_ollama_retries_rate_limit(self):
+        """Test Ollama requests retry on 429 and honor Retry-After."""
+        import httpx
+
+        statuses = [429, 503, 200]
+
+        def handler(request):
+            status = statuses.pop(0)
+            if status != 200:
+                return httpx.Response(status, headers={"Retry-After": "0"})
+            return httpx.Response(200, json={"response": "ok"})
+
+        wrapper = await self._ollama_wrapper(handler)
+
+        assert await wrapper._post_ollama({"prompt": "Hi"}) == "ok"
+        assert statuses == []
+        await wrapper.aclose()
+
+    @pytest.mark.asyncio
+    async def test_ollama_stream_checks_status(self):
+        """Test streaming retries transient statuses and raises on HTTP errors."""
+        import json
+
+        import httpx
+
+        statuses = [503, 200, 404]  # 404: model not pulled
+
+        def handler(request):
+            status = statuses.pop(0)
+            if status != 200:
+                return httpx.Response(status, headers={"Retry-After": "0"}, text="error")
+            return httpx.Response(200, text=json.dumps({"response": "ok", "done": True}))
+
+        wrapper = await self._ollama_wrapper(handler, {"LLM_MAX_RETRIES": "1"})
+
+        assert [chunk async for chunk in wrapper.generate_stream("Hi")] == ["ok"]
+        with pytest.raises(httpx.HTTPStatusError):
+            [chunk async for chunk in wrapper.generate_stream("Hi")]
+        assert statuses == []
+        assert not wrapper._inflight_limit.locked()
+        await wrapper.aclose()
+
+    @staticmethod
+    def _openai_wrapper(cache_db=""):
+        """Build an OpenAI-backed wrapper with a fake embeddings client."""
+        from types import SimpleNamespace
+
+        from core.llm_wrapper import LLMProvider, LLMWrapper
+
+        class FakeEmbeddings:
+            def __init__(self):
+                self.calls = []
+
+            def create(self, model, input):
+                self.calls.append(list(input))
+                return SimpleNamespace(
+                    data=[SimpleNamespace(embedding=[float(len(t))]) for t in input]
+                )
+
+        wrapper = LLMWrapper.__new__(LLMWrapper)
+        wrapper.provider = LLMProvider.OPENAI
+        wrapper.embedding_client = SimpleNamespace(embeddings=FakeEmbeddings())
+        with patch.dict(os.environ, {"EMBEDDING_CACHE_DB": str(cache_db)}):
+            wrapper._init_state()
+        return wrapper
+
+    @staticmethod
+    def _fake_wrapper(fake_generate, env=None):
+        """Build a wrapper whose provider call is the given coroutine function."""
+        from core.llm_wrapper import LLMProvider, LLMWrapper
+
+        wrapper = LLMWrapper.__new__(LLMWrapper)
+        wrapper.provider = LLMProvider.ANTHROPIC
+        wrapper.model = "test-model"
+        wrapper._generate_impl = fake_generate
+        with patch.dict(os.environ, env or {}):
+            wrapper._init_state()
+        return wrapper
+
+    @staticmethod
+    async def _ollama_wrapper(handler, env=None):
+        """Build an Ollama wrapper whose requests are answered by an httpx handler."""
+        import httpx
+
+        from core.llm_wrapper import LLMWrapper
+
+        with patch.dict(os.environ, {"OLLAMA_MODEL": "llama3.2", **(env or {})}, clear=True):
+            wrapper = LLMWrapper()
+        await wrapper.client.aclose()
+        wrapper.client = httpx.AsyncClient(
+            base_url="http://ollama.test", transport=httpx.MockTransport(handler)
+        )
+        return wrapper
+
+    def test_get_embeddings_batches_requests(self):
+        """Test embeddings are requested in bounded batches, preserving order."""
+        wrapper = self._openai_wrapper()
+        texts = [f"t{i}" for i in range(wrapper.MAX_EMBEDDING_BATCH + 5)]
+
+        embeddings = wrapper.get_embeddings(texts)
+
+        calls = wrapper.embedding_client.embeddings.calls
+        assert [len(c) for c in calls] == [wrapper.MAX_EMBEDDING_BATCH, 5]
+        assert embeddings == [[float(len(t))] for t in texts]
+        assert wrapper.get_embedding("abc") == [3.0]
+
+    def test_get_embeddings_dedupes_and_skips_cached(self):
+        """Test duplicate and already-cached texts are not sent to the API."""
+        wrapper = self._openai_wrapper()
+        wrapper.get_embedding("cached")
+
+        embeddings = wrapper.get_embeddings(["aa", "cached", "aa", "bbb", "aa"])
+
+        assert wrapper.embedding_client.embeddings.calls == [["cached"], ["aa", "bbb"]]
+        assert embeddings == [[2.0], [6.0], [2.0], [3.0], [2.0]]
+        assert wrapper.get_embedding_np("bbb").tolist() == [3.0]
+        assert len(wrapper.embedding_client.embeddings.calls) == 2
+
+    def test_get_embeddings_respects_token_budget(self):
+        """Test long texts are packed under the per-request token budget."""
+        wrapper = self._openai_wrapper()
+        wrapper.MAX_EMBEDDING_BATCH_TOKENS = 100
+        texts = ["y" * 150, "a", "y" * 150, "bb", "y" * 150]
+
+        embeddings = wrapper.get_embeddings(texts)
+
+        calls = wrapper.embedding_client.embeddings.calls
+        assert all(
+            sum(map(wrapper._estimate_tokens, c)) <= wrapper.MAX_EMBEDDING_BATCH_TOKENS
+            for c in calls
+        )
+        assert calls[0] == ["a", "bb", "y" * 150]
+        assert embeddings == [[float(len(t))] for t in texts]
+
+    def test_get_embedding_cache(self):
+        """Test repeated texts are served from the embedding cache."""
+        wrapper = self._openai_wrapper()
+
+        first = wrapper.get_embedding("hello")
+        second = wrapper.get_embedding("hello")
+
+        assert first == second
+        assert wrapper.get_embedding_np("hello") is wrapper.get_embedding_np("hello")
+        assert len(wrapper.embedding_client.embeddings.calls) == 1
+        stats = wrapper.get_embedding_cache_stats()
+        assert stats["hits"] == 3
+        assert stats["misses"] == 1
+
+    def test_get_embedding_persistent_cache(self, tmp_path):
+        """Test embeddings persist across wrapper instances."""
+        cache_db = tmp_path / "embedding_cache.db"
+        first = self._openai_wrapper(cache_db)
+        embedding = first.get_embedding("persist me")
+
+        second = self._openai_wrapper(cache_db)
+
+        assert second.get_embedding("persist me") == embedding
+        assert second.embedding_client.embeddings.calls == []
+
+    def test_persistent_cache_keeps_fresh_precision(self, tmp_path):
+        """Test fresh embeddings keep full precision and only the stored copy is rounded."""
+        cache_db = tmp_path / "embedding_cache.db"
+        # The fake model embeds len(text); 2049 is not representable in float16
+        text = "x" * 2049
+        first = self._openai_wrapper(cache_db)
+        assert first.get_embedding(text) == [2049.0]
+        assert first.get_embeddings(["y" * 2049]) == [[2049.0]]
+
+        second = self._openai_wrapper(cache_db)
+        assert second.get_embedding(text) == [2048.0]
+        assert second.get_embeddings(["y" * 2049]) == [[2048.0]]
+        assert second.embedding_client.embeddings.calls == []
+
+    def test_dummy_embedding_deterministic(self):
+        """Test placeholder embeddings are stable per text and distinct across texts."""
+        import numpy as np
+
+        from core.llm_wrapper import LLMWrapper
+
+        first = LLMWrapper._dummy_embedding("hello")
+
+        assert first.shape == (384,)
+        assert first.dtype == np.float32
+        assert np.array_equal(LLMWrapper._dummy_embedding("hello"), first)
+        assert not np.array_equal(LLMWrapper._dummy_embedding("world"), first)
+
+    @pytest.mark.asyncio
+    async def test_aget_embedding_shares_cache(self):
+        """Test async embedding shares the in-memory cache with the sync path."""
+        wrapper = self._openai_wrapper()
+
+        embedding = await wrapper.aget_embedding("shared")
+
+        assert wrapper.get_embedding("shared") == embedding
+        assert len(wrapper.embedding_client.embeddings.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_response_cache(self):
+        """Test the opt-in response cache skips repeated provider calls."""
+        import numpy as np
+
+        calls = []
+
+        async def fake_generate(prompt, temperature, max_tokens, system, json_mode=False):
+            calls.append(prompt)
+            return f"reply {len(calls)}"
+
+        wrapper = self._fake_wrapper(fake_generate, {"LLM_RESPONSE_CACHE_THRESHOLD": "0.92"})
+
+        assert await wrapper.generate("What is 2+2?") == "reply 1"
+        assert await wrapper.generate("What is 2+2?") == "reply 1"
+        assert await wrapper.generate("Something else") == "reply 2"
+        assert len(calls) == 2
+        assert wrapper._resp_cache_vecs.dtype == np.float16
+
+    @pytest.mark.asyncio
+    async def test_generate_coalesces_concurrent_requests(self):
+        """Test concurrent identical prompts share a single provider call."""
+        import asyncio
+
+        calls = []
+
+        async def fake_generate(prompt, temperature, max_tokens, system, json_mode=False):
+            calls.append(prompt)
+            await asyncio.sleep(0.01)
+            return f"reply to {prompt}"
+
+        wrapper = self._fake_wrapper(fake_generate)
+
+        results = await asyncio.gather(
+            wrapper.generate("same"), wrapper.generate("same"), wrapper.generate("other")
+        )
+
+        assert results == ["reply to same", "reply to same", "reply to other"]
+        assert sorted(calls) == ["other", "same"]
+        assert wrapper._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_coalesced_caller_survives_owner_cancellation(self):
+        """Test cancelling the first caller doesn't cancel others sharing its request."""
+        import asyncio
+
+        calls = []
+
+        async def fake_generate(prompt, temperature, max_tokens, system, json_mode=False):
+            calls.append(prompt)
+            await asyncio.sleep(0.05)
+            return f"reply to {prompt}"
+
+        wrapper = self._fake_wrapper(fake_generate)
+
+        owner = asyncio.create_task(wrapper.generate("same"))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(wrapper.generate("same"))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+
+        assert await follower == "reply to same"
+        assert owner.cancelled()
+        assert calls == ["same"]
+        assert wrapper._inflight == {}
+
+        # A lone caller leaving cancels the upstream call
+        lone = asyncio.create_task(wrapper.generate("lone"))
+        await asyncio.sleep(0.01)
+        lone.cancel()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert wrapper._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_generate_deterministic_cache(self):
+        """Test short temperature-0 completions are reused by exact match."""
+
+        calls = []
+
+        async def fake_generate(prompt, temperature, max_tokens, system, json_mode=False):
+            calls.append((prompt, temperature))
+            return "yes"
+
+        wrapper = self._fake_wrapper(fake_generate)
+
+        assert await wrapper.generate("Is it?", temperature=0, max_tokens=4) == "yes"
+        assert await wrapper.generate("Is it?", temperature=0, max_tokens=4) == "yes"
+        assert await wrapper.generate("Is it?", temperature=0.7, max_tokens=4) == "yes"
+        assert await wrapper.generate("Is it?", temperature=0, max_tokens=500) == "yes"
+
+        assert calls == [("Is it?", 0), ("Is it?", 0.7), ("Is it?", 0)]
+        assert len(wrapper._det_cache) == 1
+
+    @pytest.mark.asyncio
+    async def test_embedding_cache_threadsafe(self, tmp_path):
+        """Test worker-thread and loop-thread lookups share the LRU safely."""
+        import asyncio
+
+        wrapper = self._openai_wrapper(tmp_path / "emb.db")
+        wrapper.EMBEDDING_CACHE_SIZE = 8  # Force constant eviction
+
+        texts = [f"text {i}" for i in range(64)]
+        await asyncio.gather(
+            *(wrapper.aget_embeddings(texts[i : i + 16]) for i in range(0, 64, 4)),
+            *(wrapper.aget_embedding_np(text) for text in texts),
+        )
+
+        assert len(wrapper._emb_cache) <= 8
+        assert wrapper.get_embedding("text 5") == [6.0]
+        wrapper._emb_db.close()
+
+    @pytest.mark.asyncio
+    async def test_aget_embeddings_matches_sync(self):
+        """Test async embeddings return the same vectors as the sync path."""
+        wrapper = self._openai_wrapper()
+        texts = [f"text {i}" for i in range(wrapper.MAX_EMBEDDING_BATCH * 2 + 1)]
+
+        assert await wrapper.aget_embeddings(texts) == wrapper.get_embeddings(texts)
+
 
 # =============================================================================
 # Tool Manager Tests
@@ -102,6 +566,17 @@ class TestToolManager:
         assert result["success"] is True
         assert result["result"] == 4
 
+    def test_calculator_memoizes_expressions(self, manager):
+        """Test repeated expressions are served from the evaluation cache."""
+        from core.tools import _calc_evaluate
+
+        _calc_evaluate.cache_clear()
+        first = manager.execute("calculator", expression="sqrt(16) + 2 ** 3")
+        second = manager.execute("calculator", expression="sqrt(16) + 2 ** 3")
+
+        assert first["result"] == second["result"] == 12.0
+        assert _calc_evaluate.cache_info().hits == 1
+
     def test_calculator_safe_expressions(self, manager):
         """Test calculator blocks dangerous expressions."""
         result = manager.execute("calculator", expression="__import__('os').system('ls')")
@@ -139,7 +614,9 @@ class TestMemorySystem:
         memory = MemorySystem()
         memory.state_path = Path(tempfile.mkdtemp())
         await memory.initialize()
-        return memory
+        yield memory
+        # Commit deferred writes so the shared database is not left locked
+        memory.flush()
 
     @pytest.mark.asyncio
     async def test_initialize(self, memory):
@@ -167,6 +644,115 @@ class TestMemorySystem:
         assert embedding is not None
         assert len(embedding) > 0
 
+    def test_embed_cache(self):
+        """Test repeated texts are embedded once and batch calls reuse cached rows."""
+        from unittest.mock import MagicMock
+
+        import numpy as np
+
+        from core.memory import MemorySystem
+
+        memory = MemorySystem()
+        provider = MagicMock()
+        provider.embed.side_effect = lambda t: np.full(3, len(t), dtype=np.float32)
+        provider.embed_batch.side_effect = lambda ts: np.array(
+            [np.full(3, len(t)) for t in ts], dtype=np.float32
+        )
+        memory.embedding_provider = provider
+
+        first = memory.embed("abc")
+        assert memory.embed("abc") is first
+        assert not first.flags.writeable
+
+        batch = memory.embed_batch(["abc", "hello", "abc"])
+
+        assert batch[:, 0].tolist() == [3.0, 5.0, 3.0]
+        assert provider.embed.call_count == 1
+        provider.embed_batch.assert_called_once_with(["hello"])
+
+    @pytest.mark.asyncio
+    async def test_embeddings_persist_across_sessions(self, tmp_path):
+        """Test model embeddings are reloaded from the database instead of recomputed."""
+        from unittest.mock import MagicMock
+
+        import numpy as np
+
+        from core.memory import MemorySystem
+
+        def make_provider():
+            provider = MagicMock(provider_name="sentence-transformers", model_id="st/test")
+            provider.embed.side_effect = lambda t: np.full(4, len(t), dtype=np.float32)
+            provider.embed_batch.side_effect = lambda ts: np.array(
+                [np.full(4, len(t), dtype=np.float32) for t in ts]
+            )
+            return provider
+
+        first = MemorySystem(state_dir=str(tmp_path))
+        await first.initialize()
+        first.embedding_provider = make_provider()
+        first._embed_batch(["abc", "hello"], persist=True)  # ingest path
+        first.embed("a query")  # read path, not persisted
+        first.flush()
+
+        second = MemorySystem(state_dir=str(tmp_path))
+        await second.initialize()
+        provider = second.embedding_provider = make_provider()
+
+        assert second.embed("abc").tolist() == [3.0] * 4
+        batch = second.embed_batch(["hello", "a query"])
+
+        assert batch[:, 0].tolist() == [5.0, 7.0]
+        provider.embed.assert_not_called()
+        provider.embed_batch.assert_called_once_with(["a query"])
+
+    @pytest.mark.asyncio
+    async def test_stored_embeddings_are_capped(self, tmp_path):
+        """Test the embed_cache table evicts its oldest rows beyond the cap."""
+        from unittest.mock import MagicMock
+
+        import numpy as np
+
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        memory.EMBED_STORE_MAX_ROWS = 3
+        provider = MagicMock(provider_name="sentence-transformers", model_id="st/test")
+        provider.embed_batch.side_effect = lambda ts: np.ones((len(ts), 4), dtype=np.float32)
+        memory.embedding_provider = provider
+
+        memory._embed_batch(["a", "b"], persist=True)
+        memory._embed_batch(["c", "d", "e"], persist=True)
+        memory.flush()
+
+        rows = memory.db.execute("SELECT hash FROM embed_cache").fetchall()
+        assert len(rows) == 3
+        assert {row[0] for row in rows} == {memory._embed_key(t) for t in ["c", "d", "e"]}
+
+    def test_hash_fallback_embedding(self):
+        """Test fallback embeddings are deterministic float32 without global RNG use."""
+        import numpy as np
+
+        from core.memory import MemorySystem, _hash_embedding
+
+        memory = MemorySystem()
+        state = np.random.get_state()[1].copy()
+
+        first = memory.embed("same text")
+
+        assert first.dtype == np.float32
+        assert np.array_equal(memory.embed("same text"), first)
+        assert not np.array_equal(memory.embed("other text"), first)
+        assert np.array_equal(np.random.get_state()[1], state)
+
+        sample = _hash_embedding("distribution", 4096)
+        assert abs(float(sample.mean())) < 0.1
+        assert float(sample.std()) == pytest.approx(1.0, abs=0.1)
+
+        batch = memory.embed_batch(["same text", "other text"])
+        assert batch.flags.c_contiguous and batch.dtype == np.float32
+        assert np.array_equal(batch[0], first)
+
     @pytest.mark.asyncio
     async def test_store_persistent(self, memory):
         """Test persistent storage."""
@@ -194,6 +780,354 @@ class TestMemorySystem:
 
         assert 0 <= confidence <= 1
 
+    @pytest.mark.asyncio
+    async def test_get_related_memories_ranks_episodes(self, tmp_path):
+        """Test episodic results are the top-k by similarity, best first."""
+        import json
+
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        for i in range(6):
+            memory.store_episodic(event="note", content={"text": f"episode {i}"})
+
+        related = memory.get_related_memories(json.dumps({"text": "episode 4"}), k=2)
+
+        episodic = related["episodic"]
+        assert len(episodic) == 2
+        assert episodic[0]["content"] == {"text": "episode 4"}
+        assert episodic[0]["similarity"] == pytest.approx(1.0)
+        assert episodic[0]["similarity"] >= episodic[1]["similarity"]
+
+    @pytest.mark.asyncio
+    async def test_database_uses_wal(self, tmp_path):
+        """Test the memory database runs in WAL mode."""
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+
+        assert memory.db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert memory.db.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        indexes = {
+            row[0] for row in memory.db.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        }
+        assert {"idx_sem_cat", "idx_uncert_ts", "idx_uncert_resolved", "idx_uncert_conf"} <= indexes
+
+    @pytest.mark.asyncio
+    async def test_database_connection_per_thread(self, tmp_path):
+        """Test worker threads get their own connection to the same database."""
+        import asyncio
+
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        memory.store_persistent("key", {"value": 1})
+        memory.flush()
+
+        worker_db = await asyncio.to_thread(lambda: memory.db)
+        value = await asyncio.to_thread(memory.retrieve_persistent, "key")
+
+        assert worker_db is not memory.db
+        assert value == {"value": 1}
+
+    @pytest.mark.asyncio
+    async def test_uncertainty_stats(self, tmp_path):
+        """Test single-query uncertainty stats, including an empty log."""
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        empty = memory.get_uncertainty_stats()
+        assert (empty["total_entries"], empty["unresolved"], empty["last_24h"]) == (0, 0, 0)
+        assert empty["avg_confidence"] == 0.0
+
+        first = memory.log_uncertainty("a", "intent", 0.2, "", {})
+        memory.log_uncertainty("b", "intent", 0.4, "", {})
+        memory.mark_uncertainty_resolved(first, "pattern")
+        stats = memory.get_uncertainty_stats()
+
+        assert stats["total_entries"] == 2
+        assert (stats["unresolved"], stats["resolved"]) == (1, 1)
+        assert stats["avg_confidence"] == pytest.approx(0.3)
+        assert stats["last_24h"] == 2
+
+        unresolved = memory.get_uncertainty_logs(unresolved_only=True)
+        assert [log["user_message"] for log in unresolved] == ["b"]
+        assert len(memory.get_uncertainty_logs(max_confidence=0.3)) == 1
+
+    @pytest.mark.asyncio
+    async def test_bulk_episode_and_turn_writes(self, tmp_path):
+        """Test batch writers insert every row in one committed transaction."""
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+
+        written = memory.store_episodic_batch([("a", {"n": 1}, 0.1), ("b", {"n": 2}, -0.2)])
+        turns = memory.store_turn_batch([("hi", "hello"), ("bye", "goodbye")])
+
+        assert (written, turns) == (2, 2)
+        assert not memory.db.in_transaction
+        assert memory.current_turn == 2
+        assert [e["event"] for e in memory.retrieve_recent_episodic()] == ["b", "a"]
+        assert memory.db.execute("SELECT COUNT(*) FROM turns").fetchone()[0] == 2
+        assert memory.store_episodic_batch([]) == 0
+
+    @pytest.mark.asyncio
+    async def test_rows_store_compact_json(self, tmp_path):
+        """Test stored JSON has no separator whitespace and keeps UTF-8 text."""
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        memory.store_persistent("key", {"name": "café", "tags": [1, 2]})
+
+        raw = memory.db.execute("SELECT value FROM long_term WHERE key = 'key'").fetchone()[0]
+
+        assert raw == '{"name":"café","tags":[1,2]}'
+        assert memory.retrieve_persistent("key") == {"name": "café", "tags": [1, 2]}
+
+    @pytest.mark.asyncio
+    async def test_reads_use_read_only_pool(self, tmp_path):
+        """Test reads check out query-only connections but still see pending writes."""
+        import sqlite3
+
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        memory.store_persistent("key", "pending")
+        assert memory.retrieve_persistent("key") == "pending"
+
+        memory.flush()
+        with memory._read_conn() as conn:
+            assert conn is not memory.db
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM long_term")
+        assert memory.retrieve_persistent("key") == "pending"
+
+    @pytest.mark.asyncio
+    async def test_writes_commit_in_groups(self, tmp_path):
+        """Test single-row writes are deferred until the group commit threshold."""
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        memory.COMMIT_EVERY = 3
+
+        memory.store_episodic("first", {})
+        memory.store_episodic("second", {})
+        assert memory.db.in_transaction
+
+        memory.store_episodic("third", {})
+        assert not memory.db.in_transaction
+
+        memory.store_persistent("key", "value")
+        await memory.save_state()
+        assert not memory.db.in_transaction
+
+    @pytest.mark.asyncio
+    async def test_semantic_store_and_search(self, tmp_path):
+        """Test stored semantic memories are found by similarity."""
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        ids = [memory.store_semantic(f"fact {i}", category="facts") for i in range(5)]
+
+        results = memory.search_semantic("fact 3", k=2)
+
+        assert results[0]["id"] == ids[3]
+        assert results[0]["content"] == "fact 3"
+        # int8-quantized index: similarities are exact to within ~1e-2
+        assert results[0]["similarity"] == pytest.approx(1.0, abs=1e-2)
+
+    @pytest.mark.asyncio
+    async def test_store_semantic_batch(self, tmp_path):
+        """Test batched semantic inserts return IDs in order and are searchable."""
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        ids = memory.store_semantic_batch(["alpha", "beta", "gamma"], category="greek")
+
+        assert len(set(ids)) == 3
+        assert list(memory.semantic_id_map) == ids
+        result = memory.search_semantic("beta", k=1)[0]
+        assert (result["id"], result["category"]) == (ids[1], "greek")
+        assert memory.search_semantic("beta", k=1, category="latin") == []
+
+    @pytest.mark.asyncio
+    async def test_semantic_search_without_faiss(self, tmp_path):
+        """Test the no-FAISS fallback grows its matrix and ranks by similarity."""
+        from core import memory as memory_module
+
+        with patch.object(memory_module, "FAISS_AVAILABLE", False):
+            memory = memory_module.MemorySystem(state_dir=str(tmp_path))
+            await memory.initialize()
+            ids = memory.store_semantic_batch([f"fact {i}" for i in range(100)])
+
+            results = memory.search_semantic("fact 42", k=3)
+
+        assert len(memory.vector_store) >= 100
+        assert results[0]["id"] == ids[42]
+        assert results[0]["similarity"] == pytest.approx(1.0, abs=1e-5)
+        assert [r["similarity"] for r in results] == sorted(
+            (r["similarity"] for r in results), reverse=True
+        )
+
+    @pytest.mark.asyncio
+    async def test_semantic_index_reloads_from_disk(self, tmp_path):
+        """Test the index and binary id map survive a save/reload cycle."""
+        from core.memory import FAISS_AVAILABLE, MemorySystem
+
+        if not FAISS_AVAILABLE:
+            pytest.skip("FAISS not installed")
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        ids = memory.store_semantic_batch(["red", "green", "blue"])
+        await memory.save_state()
+
+        reloaded = MemorySystem(state_dir=str(tmp_path))
+        await reloaded.initialize()
+
+        assert (tmp_path / "embeddings" / "id_map.npy").exists()
+        assert list(reloaded.semantic_id_map) == ids
+        assert reloaded.search_semantic("green", k=1)[0]["id"] == ids[1]
+
+        # Nothing added since load: saving leaves the index file untouched
+        index_file = tmp_path / "embeddings" / "index.faiss"
+        mtime = index_file.stat().st_mtime_ns
+        await reloaded.save_state()
+        assert index_file.stat().st_mtime_ns == mtime
+
+    @pytest.mark.asyncio
+    async def test_semantic_index_rebuilds_on_scheme_change(self, tmp_path, monkeypatch):
+        """Test a persisted index is rebuilt when the embedding scheme changes."""
+        import core.memory
+        from core.memory import FAISS_AVAILABLE, MemorySystem
+
+        if not FAISS_AVAILABLE:
+            pytest.skip("FAISS not installed")
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        memory.store_semantic_batch(["red", "green", "blue"])
+        await memory.save_state()
+        old_scheme = memory.retrieve_persistent(MemorySystem.INDEX_SCHEME_KEY)
+        assert old_scheme.startswith(memory.embedding_provider.model_id)
+
+        monkeypatch.setattr(core.memory, "_HASH_EMBEDDING_VERSION", 999)
+        monkeypatch.setattr(core.memory, "SENTENCE_TRANSFORMERS_AVAILABLE", False)
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        reloaded = MemorySystem(state_dir=str(tmp_path))
+        await reloaded.initialize()
+
+        new_scheme = reloaded.retrieve_persistent(MemorySystem.INDEX_SCHEME_KEY)
+        assert new_scheme != old_scheme
+        assert new_scheme.startswith("hash-fallback-v999")
+        assert reloaded._index_dirty  # Rebuilt from the database, not the stale file
+        assert reloaded.vector_store.ntotal == 3
+
+    @pytest.mark.asyncio
+    async def test_semantic_index_upgrades_to_hnsw(self, tmp_path):
+        """Test the flat index is migrated to HNSW past the size threshold."""
+        from core.memory import FAISS_AVAILABLE, MemorySystem
+
+        if not FAISS_AVAILABLE:
+            pytest.skip("FAISS not installed")
+        import faiss
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        memory.ANN_INDEX_THRESHOLD = 4
+        await memory.initialize()
+        ids = [memory.store_semantic(f"fact {i}") for i in range(6)]
+
+        assert isinstance(memory.vector_store, faiss.IndexHNSWSQ)
+        assert memory.vector_store.hnsw.efConstruction == memory.ANN_EF_CONSTRUCTION
+        assert memory.vector_store.ntotal == 6
+        assert memory.search_semantic("fact 2", k=1)[0]["id"] == ids[2]
+
+    @pytest.mark.asyncio
+    async def test_ann_threshold_zero_keeps_flat_index(self, tmp_path, monkeypatch):
+        """Test MEMORY_ANN_THRESHOLD=0 disables the HNSW migration."""
+        from core.memory import FAISS_AVAILABLE, MemorySystem
+
+        if not FAISS_AVAILABLE:
+            pytest.skip("FAISS not installed")
+        import faiss
+
+        monkeypatch.setenv("MEMORY_ANN_THRESHOLD", "0")
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        memory.store_semantic_batch([f"fact {i}" for i in range(3)])
+
+        assert not isinstance(memory.vector_store, faiss.IndexHNSW)
+        assert memory.vector_store.ntotal == 3
+
+    @pytest.mark.asyncio
+    async def test_grounding_confidence_weights_matches(self, tmp_path):
+        """Test grounding uses stored importance and boosts strong matches."""
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        assert memory.grounding_confidence("anything") == 0.5
+
+        memory.store_semantic("the sky is blue", importance=0.9)
+
+        assert memory.grounding_confidence("the sky is blue") == pytest.approx(1.0, abs=1e-2)
+        assert memory.grounding_confidence("unrelated words") == 0.3
+
+    @pytest.mark.asyncio
+    async def test_log_uncertainty_batch(self, tmp_path):
+        """Test batched uncertainty logging matches single-entry logging."""
+        from core.memory import MemorySystem
+
+        memory = MemorySystem(state_dir=str(tmp_path))
+        await memory.initialize()
+        memory.log_uncertainty("single", "intent", 0.2, "ctx", {"a": 0.1})
+
+        written = memory.log_uncertainty_batch(
+            [("first", "intent", 0.3, "x" * 5000, {"b": 0.2}), ("second", "intent", 0.4, "", {})]
+        )
+
+        logs = memory.get_uncertainty_logs()
+        assert written == 2
+        assert {log["user_message"] for log in logs} == {"single", "first", "second"}
+        assert max(len(log["context"]) for log in logs) == 2000
+        assert memory.get_uncertainty_stats()["total_entries"] == 3
+
+    def test_top_k_indices(self):
+        """Test partial top-k selection returns the best scores in order."""
+        import numpy as np
+
+        from core.memory import _top_k_indices
+
+        scores = np.array([0.1, 0.9, 0.4, 0.7, 0.2], dtype=np.float32)
+
+        assert _top_k_indices(scores, 3).tolist() == [1, 3, 2]
+        assert _top_k_indices(scores, 10).tolist() == [1, 3, 2, 4, 0]
+        assert _top_k_indices(scores, 0).tolist() == []
+
+    def test_cosine_similarity(self):
+        """Test cosine similarity, including zero vectors."""
+        import numpy as np
+
+        from core.memory import EmbeddingProvider
+
+        a = np.array([1.0, 2.0, 3.0], dtype=np.float32)
+        b = np.array([-2.0, 0.5, 1.0], dtype=np.float32)
+        expected = np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+
+        assert EmbeddingProvider.cosine_similarity(a, b) == pytest.approx(expected)
+        assert EmbeddingProvider.cosine_similarity(a, a) == pytest.approx(1.0)
+        assert EmbeddingProvider.cosine_similarity(a, np.zeros(3)) == 0.0
+
     def test_detect_coherence_drift(self):
         """Test coherence drift detection."""
         from core.memory import MemorySystem
@@ -203,6 +1137,24 @@ class TestMemorySystem:
 
         assert isinstance(drift, bool)
 
+    def test_detect_coherence_drift_tracks_context(self):
+        """Test drift is flagged only when recent context diverges."""
+        from core.memory import MemorySystem
+
+        memory = MemorySystem()
+        for _ in range(3):
+            memory.track_context_embedding("same topic")
+        assert memory.detect_coherence_drift(threshold=0.7) is False
+
+        for i in range(3):
+            memory.track_context_embedding(f"unrelated {i}")
+        assert memory.detect_coherence_drift(threshold=0.7) is True
+
+        # Wrap the ring buffer: the oldest slots are overwritten by the newest rows
+        for _ in range(memory._max_context_embeddings + 2):
+            memory.track_context_embedding("back on topic")
+        assert memory.detect_coherence_drift(threshold=0.7) is False
+
 
 # =============================================================================
 # Integration Tests
@@ -67,6 +67,11 @@ class MockMemory:
         rng = np.random.default_rng(hash_val)
         return rng.standard_normal(384)
 
+    def embed_batch(self, texts):
+        import numpy as np
+
+        return np.array([self.embed(text) for text in texts]).reshape(len(texts), 384)
+
     def store_episodic(self, event, content, valence=0.0):
         self.episodic_store.append({"event": event, "content": content, "valence": valence})
 
@@ -172,6 +177,10 @@ class TestPredictiveDreaming:
             assert "prob" in dream
             assert "embedding" in dream
             assert not dream["rewarded"]
+        assert module.top_dream is max(module.dream_buffer, key=lambda d: d["prob"])
+
+        module.resolve_dreams("Hello again")
+        assert module.top_dream is None
 
     def test_resolve_dreams_computes_alignment(self, module):
         """Test that resolve_dreams computes alignment scores."""
@@ -567,6 +576,22 @@ class TestAssuranceResolution:
         module.seek_resolution(module.pending_concerns[0])
         assert module.assurance_success_rate() == 0.5  # 1 of 2
 
+    @pytest.mark.asyncio
+    async def test_corpus_saves_off_loop(self, module, tmp_path):
+        """Test the async corpus save writes the same file as the sync one."""
+        import json
+
+        if module.mandelbrot is None:
+            pytest.skip("Mandelbrot weighting unavailable")
+
+        module.mandelbrot.update_corpus("backup the storage schedule")
+        module.mandelbrot.save_corpus(str(tmp_path / "sync.json"))
+        await module.mandelbrot.save_corpus_async(str(tmp_path / "async.json"))
+
+        saved = json.loads((tmp_path / "async.json").read_text())
+        assert saved == json.loads((tmp_path / "sync.json").read_text())
+        assert saved["frequencies"]["backup"] >= 1
+
 
 # =============================================================================
 # Run tests
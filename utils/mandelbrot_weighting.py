@@ -14,6 +14,7 @@ Where:
 - C: normalization constant
 """
 
+import asyncio
 import json
 import math
 import re
@@ -532,20 +533,42 @@ class MandelbrotWeighting:
         if not save_path:
             return
 
-        save_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_corpus(save_path, self._corpus_snapshot())
+
+    async def save_corpus_async(self, path: Optional[str] = None):
+        """
+        Save the frequency corpus without blocking the event loop.
+
+        The snapshot is taken on the calling thread, so the corpus can keep
+        changing while the file is written in a worker thread.
+
+        Args:
+            path: Override path (uses self.corpus_path if not specified)
+        """
+        save_path = Path(path) if path else self.corpus_path
+        if not save_path:
+            return
 
-        data = {
+        await asyncio.to_thread(self._write_corpus, save_path, self._corpus_snapshot())
+
+    def _corpus_snapshot(self) -> dict:
+        """Copy the persisted corpus fields into a plain dict."""
+        return {
             "alpha": self.alpha,
             "beta": self.beta,
             "min_weight": self.min_weight,
             "max_weight": self.max_weight,
             "total_words": self.total_words,
             "frequencies": dict(self.word_frequencies.most_common(10000)),  # Top 10k
-            "domain_boosts": self.domain_boost_words,
+            "domain_boosts": dict(self.domain_boost_words),
         }
 
+    @staticmethod
+    def _write_corpus(save_path: Path, data: dict):
+        """Serialize a corpus snapshot to disk."""
+        save_path.parent.mkdir(parents=True, exist_ok=True)
         with open(save_path, "w") as f:
-            json.dump(data, f, indent=2)
+            f.write(json.dumps(data, indent=2))
 
     def _load_corpus(self):
         """Load frequency corpus from disk."""
@@ -3,7 +3,7 @@ Metrics Tracker
 Aggregates performance metrics across psychological modules.
 """
 
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 
 class MetricsTracker:
@@ -90,8 +90,6 @@ class MetricsTracker:
         if not self.flow_states:
             return {"balanced": 1.0}
 
-        from collections import Counter
-
         counts = Counter(self.flow_states[-20:])
         total = sum(counts.values())
         return {state: count / total for state, count in counts.items()}